@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from analytics_data_api.v0.caching import make_cache_key
+
+
+def get_token_cache_key(key):
+    return make_cache_key('auth_token', key)
+
+
+def invalidate_cached_tokens(keys):
+    """ Removes the given token keys from the cache used by CachedTokenAuthentication. """
+    cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches validated tokens, avoiding a database round trip on most requests.
+
+    Tokens are cached for AUTH_TOKEN_CACHE_TIMEOUT seconds. Tokens deleted or replaced with the helpers in
+    analytics_data_api.utils (e.g. by the set_api_key management command) are removed from the cache, which revokes
+    them immediately only if the cache is shared by every process serving the API. With a process-local cache, and for
+    users deactivated by other means, revoked tokens are accepted until they expire from the cache.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        credentials = cache.get(cache_key)
+
+        if credentials is None:
+            # Only valid credentials are cached. Invalid ones raise AuthenticationFailed.
+            credentials = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            cache.set(cache_key, credentials, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+        return credentials
@@ -15,17 +15,44 @@ def _get_country_property(code, property_name):
     return unicode(getattr(countries, property_name)(code))
 
 
+def _build_country_table():
+    """
+    Returns a dict mapping every two-letter, three-letter, and numeric ISO 3166 code to its Country.
+
+    All codes for a given country map to the same Country instance.
+    """
+    table = {UNKNOWN_COUNTRY_CODE: UNKNOWN_COUNTRY}
+
+    for alpha2 in countries.countries:
+        country = Country(*[_get_country_property(alpha2, name) for name in ('name', 'alpha2', 'alpha3', 'numeric')])
+        table[country.alpha2] = country  # pylint: disable=no-member
+
+        if country.alpha3:  # pylint: disable=no-member
+            table[country.alpha3] = country  # pylint: disable=no-member
+
+        numeric = countries.numeric(alpha2)
+        if numeric is not None:
+            table[unicode(numeric)] = country
+
+    return table
+
+
+# Countries do not change while the server is running, so the table is built once instead of calling django_countries
+# for every lookup.
+_COUNTRIES = _build_country_table()
+
+
 def get_country(code):
     if not code:
         return UNKNOWN_COUNTRY
 
-    name = _get_country_property(code, 'name')
-    if not name:
-        return UNKNOWN_COUNTRY
+    # Most codes are stored as upper-case, two-letter codes, so try those before normalizing.
+    country = _COUNTRIES.get(code)
 
-    args = []
-    properties = ['alpha2', 'alpha3', 'numeric']
-    for property_name in properties:
-        args.append(_get_country_property(code, property_name))
+    if country is None:
+        code = code.upper()
+        if code.isdigit():
+            code = unicode(int(code))
+        country = _COUNTRIES.get(code, UNKNOWN_COUNTRY)
 
-    return Country(name, *args)
+    return country
@@ -0,0 +1,4 @@
+DAY = u'day'
+WEEK = u'week'
+MONTH = u'month'
+ALL = [DAY, WEEK, MONTH]
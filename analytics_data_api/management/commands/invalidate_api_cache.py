@@ -0,0 +1,25 @@
+"""A command to invalidate cached API responses after the data pipeline loads new data."""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics_data_api.v0.caching import bump_data_version
+
+
+class Command(BaseCommand):
+    """A command to invalidate cached API responses after the data pipeline loads new data."""
+
+    help = 'Invalidate cached responses for the specified tables, or for all tables if none are specified.'
+    args = '<table table ...>'
+
+    def handle(self, *args, **options):
+        # pylint: disable=protected-access
+        all_tables = [model._meta.db_table for model in apps.get_app_config('v0').get_models()]
+        tables = args or all_tables
+
+        unknown_tables = set(tables) - set(all_tables)
+        if unknown_tables:
+            raise CommandError("Unknown tables: {0}".format(', '.join(sorted(unknown_tables))))
+
+        bump_data_version(*tables)
+        self.stdout.write('Invalidated cached responses for: {0}'.format(', '.join(tables)))
@@ -0,0 +1,72 @@
+"""A command to record the latest date for which each course has data, after the data pipeline loads new data."""
+
+import datetime
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils.timezone import is_aware, utc
+
+from analytics_data_api.v0 import models, sharding
+from analytics_data_api.v0.caching import bump_data_version
+
+
+def get_dated_models():
+    """ Returns the models of course data that have a latest date. """
+    # pylint: disable=protected-access
+    return [model for model in apps.get_app_config('v0').get_models()
+            if model._meta.get_latest_by and 'course_id' in model._meta.get_all_field_names()]
+
+
+def to_datetime(value):
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+
+    if not is_aware(value):
+        value = value.replace(tzinfo=utc)
+
+    return value
+
+
+class Command(BaseCommand):
+    """A command to record the latest date for which each course has data, after the data pipeline loads new data."""
+
+    help = 'Record the latest date for which each course has data in the specified tables, or in all tables if none ' \
+           'are specified. Cached responses for the tables are invalidated.'
+    args = '<table table ...>'
+
+    def handle(self, *args, **options):
+        # pylint: disable=protected-access
+        dated_models = dict((model._meta.db_table, model) for model in get_dated_models())
+        tables = args or sorted(dated_models.keys())
+
+        unknown_tables = set(tables) - set(dated_models.keys())
+        if unknown_tables:
+            raise CommandError("Unknown tables: {0}".format(', '.join(sorted(unknown_tables))))
+
+        for table in tables:
+            model = dated_models[table]
+            courses = 0
+
+            # Each database records the latest dates of the courses it holds.
+            for database in sharding.get_databases():
+                latest_dates = model.objects.using(database).values('course_id').annotate(
+                    latest_date=Max(model._meta.get_latest_by))
+
+                # Clear the default ordering, which would otherwise be added to the GROUP BY clause.
+                latest_dates = latest_dates.order_by()
+
+                with transaction.atomic(using=database):
+                    models.CourseLatestDate.objects.using(database).filter(table_name=table).delete()
+                    models.CourseLatestDate.objects.using(database).bulk_create([
+                        # pylint: disable=no-value-for-parameter,unexpected-keyword-arg
+                        models.CourseLatestDate(table_name=table, course_id=row['course_id'],
+                                                latest_date=to_datetime(row['latest_date']))
+                        for row in latest_dates
+                    ])
+
+                courses += len(latest_dates)
+
+            bump_data_version(table)
+            self.stdout.write('Updated latest dates for {0} courses in {1}'.format(courses, table))
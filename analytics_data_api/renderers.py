@@ -0,0 +1,159 @@
+import csv
+from importlib import import_module
+import json
+from StringIO import StringIO
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six
+from rest_framework import renderers
+from rest_framework_csv.renderers import CSVRenderer
+
+
+def _dumps_json(data, encoder_class, indent, ensure_ascii):
+    return json.dumps(data, cls=encoder_class, indent=indent, ensure_ascii=ensure_ascii)
+
+
+def _dumps_simplejson(data, encoder_class, indent, ensure_ascii):
+    # simplejson's speedups are more complete than those of the standard library. These options disable its extensions,
+    # and make the output identical to that of the standard library.
+    return _get_json_module('simplejson').dumps(
+        data, default=encoder_class().default, indent=indent, ensure_ascii=ensure_ascii, separators=(', ', ': '),
+        use_decimal=False, namedtuple_as_object=False, tuple_as_array=True, iterable_as_array=False, for_json=False)
+
+
+# Names of the JSON libraries that can be listed in the JSON_RENDERER_BACKENDS setting, and the functions that encode
+# data with them. Libraries are only supported if their output is identical to that of the standard library.
+JSON_BACKENDS = {
+    'json': _dumps_json,
+    'simplejson': _dumps_simplejson,
+}
+
+_json_modules = {}
+
+
+def _get_json_module(name):
+    """ Returns the named JSON library, or None if it is not installed. """
+    if name not in _json_modules:
+        try:
+            _json_modules[name] = import_module(name)
+        except ImportError:
+            _json_modules[name] = None
+
+    return _json_modules[name]
+
+
+def get_json_backend():
+    """ Returns the function that encodes data with the first installed library listed in JSON_RENDERER_BACKENDS. """
+    for name in settings.JSON_RENDERER_BACKENDS:
+        if name not in JSON_BACKENDS:
+            raise ImproperlyConfigured(u'Unsupported JSON renderer backend: {0}'.format(name))
+
+        if _get_json_module(name) is not None:
+            return JSON_BACKENDS[name]
+
+    raise ImproperlyConfigured(u'None of the JSON renderer backends are installed.')
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer that encodes data with the first installed library listed in the JSON_RENDERER_BACKENDS setting.
+
+    The output is identical to that of the JSONRenderer provided by Django REST Framework.
+    """
+
+    def dumps(self, data, indent=None):
+        ret = get_json_backend()(data, self.encoder_class, indent, self.ensure_ascii)
+
+        if isinstance(ret, six.text_type):
+            ret = ret.encode('utf-8')
+
+        return ret
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return self.dumps(data, indent)
+
+
+class StreamingRendererMixin(object):
+    """
+    Renderer that can also render rows as they are serialized, for streaming responses.
+    """
+
+    # Rendered rows are buffered and yielded in chunks of about this many bytes, rather than one at a time.
+    chunk_size = 64 * 1024
+
+    def render_rows(self, rows):
+        """ Yields the rendered content for the given iterable of serialized rows, in pieces of any size. """
+        raise NotImplementedError
+
+    def render_stream(self, rows):
+        """ Yields the rendered content for the given iterable of serialized rows, in chunks. """
+        chunk = []
+        size = 0
+
+        for piece in self.render_rows(rows):
+            chunk.append(piece)
+            size += len(piece)
+
+            if size >= self.chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+
+        if chunk:
+            yield ''.join(chunk)
+
+
+class StreamingCSVRenderer(StreamingRendererMixin, CSVRenderer):
+    """
+    CSV renderer that can also render rows as they are serialized, for streaming responses.
+
+    The output of render_stream is identical to that of render, provided every row has the same fields, as is the case
+    for rows serialized by the same serializer.
+    """
+
+    def _write_row(self, writer, row):
+        # Assume that strings should be encoded as UTF-8
+        writer.writerow([elem.encode('utf-8') if isinstance(elem, unicode) else elem for elem in row])
+
+    def render_rows(self, rows):
+        csv_buffer = StringIO()
+        csv_writer = csv.writer(csv_buffer)
+        header = None
+
+        for item in rows:
+            item = self.flatten_item(item)
+
+            if header is None:
+                header = self.headers or sorted(item.keys())
+                self._write_row(csv_writer, header)
+
+            self._write_row(csv_writer, [item.get(key, None) for key in header])
+            yield csv_buffer.getvalue()
+            csv_buffer.seek(0)
+            csv_buffer.truncate()
+
+
+class StreamingJSONRenderer(StreamingRendererMixin, JSONRenderer):
+    """
+    JSON renderer that can also render rows as they are serialized, for streaming responses.
+
+    Clients opt in to streaming with ?format=json-stream. The streamed array is identical to the one rendered by the
+    JSONRenderer, except that it is never indented.
+    """
+
+    format = 'json-stream'
+
+    def render_rows(self, rows):
+        separator = '['
+
+        for item in rows:
+            yield separator
+            yield self.dumps(item)
+            separator = ', '
+
+        yield '[]' if separator == '[' else ']'
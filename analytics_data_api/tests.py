@@ -1,12 +1,29 @@
+import datetime
+from decimal import Decimal
+from unittest import skipUnless
+
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.core.management import call_command, CommandError
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.datastructures import SortedDict
+from django.utils.timezone import utc
 from django_dynamic_fixture import G
+import mock
+from rest_framework import renderers as rest_renderers
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
 
-from analytics_data_api.constants.country import get_country, UNKNOWN_COUNTRY
+from analytics_data_api.authentication import CachedTokenAuthentication
+from analytics_data_api.constants.country import get_country, UNKNOWN_COUNTRY, UNKNOWN_COUNTRY_CODE
+from analytics_data_api import renderers
+from analytics_data_api.renderers import JSONRenderer, StreamingCSVRenderer, StreamingJSONRenderer
 
 from analytics_data_api.utils import delete_user_auth_token, set_user_auth_token
+from analytics_data_api.v0 import models
+from analytics_data_api.v0.caching import get_data_version
 
 
 class UtilsTests(TestCase):
@@ -46,6 +63,41 @@ class UtilsTests(TestCase):
         self.assertRaises(AttributeError, set_user_auth_token, user2, key)
 
 
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        super(CachedTokenAuthenticationTests, self).setUp()
+        cache.clear()
+        self.authentication = CachedTokenAuthentication()
+        self.user = G(User, is_active=True)
+        self.token = G(Token, user=self.user)
+
+    def test_authenticate_cached(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.authentication.authenticate_credentials(self.token.key), (self.user, self.token))
+
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual((user, token), (self.user, self.token))
+
+    def test_invalid_token(self):
+        self.assertRaises(AuthenticationFailed, self.authentication.authenticate_credentials, 'invalid')
+
+        # Invalid tokens are not cached.
+        G(Token, user=G(User, is_active=True), key='invalid')
+        self.authentication.authenticate_credentials('invalid')
+
+    def test_delete_user_auth_token(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        delete_user_auth_token(self.user.username)
+        self.assertRaises(AuthenticationFailed, self.authentication.authenticate_credentials, self.token.key)
+
+    def test_set_user_auth_token(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        set_user_auth_token(self.user, 'new key')
+        self.assertRaises(AuthenticationFailed, self.authentication.authenticate_credentials, self.token.key)
+        self.assertEqual(self.authentication.authenticate_credentials('new key')[0], self.user)
+
+
 class SetApiKeyTests(TestCase):
     def test_delete_key(self):
         user = G(User)
@@ -80,6 +132,146 @@ class SetApiKeyTests(TestCase):
         self.assertFalse(Token.objects.filter(user=user2).exists())
 
 
+class InvalidateApiCacheTests(TestCase):
+    def setUp(self):
+        super(InvalidateApiCacheTests, self).setUp()
+        cache.clear()
+
+    def test_invalidate_table(self):
+        version = get_data_version('course_enrollment_daily')
+        other_version = get_data_version('answer_distribution')
+        call_command('invalidate_api_cache', 'course_enrollment_daily')
+        self.assertGreater(get_data_version('course_enrollment_daily'), version)
+        self.assertEqual(get_data_version('answer_distribution'), other_version)
+
+    def test_invalidate_all_tables(self):
+        versions = [get_data_version(table) for table in ('course_enrollment_daily', 'answer_distribution')]
+        call_command('invalidate_api_cache')
+        for table, version in zip(('course_enrollment_daily', 'answer_distribution'), versions):
+            self.assertGreater(get_data_version(table), version)
+
+    def test_unknown_table(self):
+        self.assertRaises(CommandError, call_command, 'invalidate_api_cache', 'auth_user')
+
+
+class UpdateLatestDatesTests(TestCase):
+    def setUp(self):
+        super(UpdateLatestDatesTests, self).setUp()
+        cache.clear()
+        self.date = datetime.date(2014, 1, 1)
+        self.interval_end = datetime.datetime(2014, 1, 8, tzinfo=utc)
+
+        for days in range(3):
+            G(models.CourseEnrollmentDaily, course_id='edX/DemoX/Demo_Course',
+              date=self.date - datetime.timedelta(days=days))
+        G(models.CourseEnrollmentDaily, course_id='edX/DemoX/Other', date=self.date - datetime.timedelta(days=7))
+        G(models.CourseActivityWeekly, course_id='edX/DemoX/Demo_Course', interval_end=self.interval_end)
+
+    def get_latest_dates(self, table):
+        return dict(models.CourseLatestDate.objects.filter(table_name=table).values_list('course_id', 'latest_date'))
+
+    def test_update_all_tables(self):
+        G(models.CourseLatestDate, table_name='course_enrollment_daily', course_id='edX/DemoX/Removed')
+        version = get_data_version('course_enrollment_daily')
+        call_command('update_latest_dates')
+
+        self.assertDictEqual(self.get_latest_dates('course_enrollment_daily'), {
+            'edX/DemoX/Demo_Course': datetime.datetime(2014, 1, 1, tzinfo=utc),
+            'edX/DemoX/Other': datetime.datetime(2013, 12, 25, tzinfo=utc),
+        })
+        self.assertDictEqual(self.get_latest_dates('course_activity'), {'edX/DemoX/Demo_Course': self.interval_end})
+        self.assertGreater(get_data_version('course_enrollment_daily'), version)
+
+    def test_update_table(self):
+        call_command('update_latest_dates', 'course_activity')
+        self.assertDictEqual(self.get_latest_dates('course_enrollment_daily'), {})
+        self.assertDictEqual(self.get_latest_dates('course_activity'), {'edX/DemoX/Demo_Course': self.interval_end})
+
+    def test_unknown_table(self):
+        self.assertRaises(CommandError, call_command, 'update_latest_dates', 'answer_distribution')
+
+
+class StreamingCSVRendererTests(TestCase):
+    def setUp(self):
+        self.renderer = StreamingCSVRenderer()
+        self.data = [
+            {'count': index, 'name': u'Caf\xe9 {0}'.format(index), 'country': {'alpha2': 'US', 'alpha3': None}}
+            for index in range(1000)
+        ]
+
+    def test_render_stream(self):
+        """ Streamed CSV should be identical to CSV rendered all at once. """
+        self.renderer.chunk_size = 1024
+        chunks = list(self.renderer.render_stream(iter(self.data)))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), self.renderer.render(self.data))
+
+    def test_render_stream_empty(self):
+        self.assertEqual(list(self.renderer.render_stream(iter([]))), [])
+
+
+class StreamingJSONRendererTests(TestCase):
+    def setUp(self):
+        self.renderer = StreamingJSONRenderer()
+
+    def test_render_stream(self):
+        """ Streamed JSON should be identical to JSON rendered all at once. """
+        data = [
+            {'count': index, 'name': u'Caf\xe9 {0}'.format(index), 'date': datetime.date(2014, 1, 1)}
+            for index in range(1000)
+        ]
+        self.renderer.chunk_size = 1024
+        chunks = list(self.renderer.render_stream(iter(data)))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), self.renderer.render(data))
+
+    def test_render_stream_empty(self):
+        self.assertEqual(''.join(self.renderer.render_stream(iter([]))), self.renderer.render([]))
+
+
+class JSONRendererTests(TestCase):
+    data = [
+        SortedDict([('course_id', u'edX/DemoX/Demo_Course'), ('date', u'2014-01-01'), ('count', 10L),
+                    ('created', u'2014-01-02T030405'), ('percent', 12.5), ('correct', None), ('valid', True)]),
+        {'name': u'Caf\xe9 \u2603', 'date': datetime.date(2014, 1, 1),
+         'created': datetime.datetime(2014, 1, 2, 3, 4, 5, 678901, tzinfo=utc), 'value': Decimal('1.50'),
+         'codes': (u'US', u'USA'), 'country': get_country('US')},
+        [],
+    ]
+
+    def assertRenderedIdentically(self, renderer):
+        expected_renderer = rest_renderers.JSONRenderer()
+
+        for media_type in (None, 'application/json; indent=4'):
+            self.assertEqual(renderer.render(self.data, media_type), expected_renderer.render(self.data, media_type))
+
+    @override_settings(JSON_RENDERER_BACKENDS=('json',))
+    def test_render_json(self):
+        self.assertRenderedIdentically(JSONRenderer())
+
+    @skipUnless(renderers._get_json_module('simplejson'), 'simplejson is not installed')  # pylint: disable=protected-access
+    @override_settings(JSON_RENDERER_BACKENDS=('simplejson',))
+    def test_render_simplejson(self):
+        self.assertRenderedIdentically(JSONRenderer())
+
+    def test_get_json_backend(self):
+        with override_settings(JSON_RENDERER_BACKENDS=('json', 'simplejson')):
+            self.assertEqual(renderers.get_json_backend(), renderers.JSON_BACKENDS['json'])
+
+        # Backends that are not installed are skipped
+        with mock.patch.dict(renderers._json_modules, {'simplejson': None}):  # pylint: disable=protected-access
+            with override_settings(JSON_RENDERER_BACKENDS=('simplejson', 'json')):
+                self.assertEqual(renderers.get_json_backend(), renderers.JSON_BACKENDS['json'])
+
+            with override_settings(JSON_RENDERER_BACKENDS=('simplejson',)):
+                self.assertRaises(ImproperlyConfigured, renderers.get_json_backend)
+
+        with override_settings(JSON_RENDERER_BACKENDS=('cjson', 'json')):
+            self.assertRaises(ImproperlyConfigured, renderers.get_json_backend)
+
+
 class CountryTests(TestCase):
     def test_get_country(self):
         # Countries should be accessible 2 or 3 digit country code
@@ -91,3 +283,15 @@ class CountryTests(TestCase):
         # Return unknown country if code is invalid
         self.assertEqual(get_country('A1'), UNKNOWN_COUNTRY)
         self.assertEqual(get_country(None), UNKNOWN_COUNTRY)
+        self.assertEqual(get_country(UNKNOWN_COUNTRY_CODE), UNKNOWN_COUNTRY)
+
+    def test_get_country_codes(self):
+        # All codes for a country, in any case, resolve to the same instance
+        country = get_country('US')
+        self.assertEqual(country, ('United States', 'US', 'USA', '840'))
+        for code in ('us', 'USA', 'usa', '840', '0840'):
+            self.assertIs(get_country(code), country)
+
+        # Numeric codes are not padded
+        self.assertEqual(get_country('AF').numeric, '4')
+        self.assertIs(get_country('004'), get_country('AF'))
@@ -1,6 +1,8 @@
 from django.db.models import Q
 from rest_framework.authtoken.models import Token
 
+from analytics_data_api.authentication import invalidate_cached_tokens
+
 
 def delete_user_auth_token(username):
     """
@@ -10,7 +12,10 @@ def delete_user_auth_token(username):
     :param username: Username of the user whose authentication tokens should be deleted
     :return: None
     """
-    Token.objects.filter(user__username=username).delete()
+    tokens = Token.objects.filter(user__username=username)
+    keys = list(tokens.values_list('key', flat=True))
+    tokens.delete()
+    invalidate_cached_tokens(keys)
 
 
 def set_user_auth_token(user, key):
@@ -27,7 +32,10 @@ def set_user_auth_token(user, key):
     if Token.objects.filter(~Q(user=user), key=key).exists():
         raise AttributeError("The key %s is already in use by another user.", key)
 
-    Token.objects.filter(user=user).delete()
+    tokens = Token.objects.filter(user=user)
+    keys = list(tokens.values_list('key', flat=True))
+    tokens.delete()
+    invalidate_cached_tokens(keys)
     Token.objects.create(user=user, key=key)
 
     print "Set API key for user %s to %s" % (user, key)
@@ -0,0 +1,61 @@
+"""
+Aggregates that are not provided by Django.
+
+These make it possible to pivot rows into columns in the database (e.g. one count per gender for each date) instead of
+retrieving every row and pivoting in Python.
+"""
+
+from django.db.models import Aggregate
+from django.db.models.sql.aggregates import Aggregate as SQLAggregate
+
+
+class SQLConditionalSum(SQLAggregate):
+    sql_function = 'SUM'
+    sql_template = '%(function)s(CASE WHEN %(condition)s THEN %(field)s END)'
+
+    def __init__(self, col, condition_column, values, negate=False, **extra):
+        super(SQLConditionalSum, self).__init__(col, **extra)
+        self.condition_column = condition_column
+        self.values = list(values)
+        self.negate = negate
+
+    def as_sql(self, qn, connection):
+        table_alias, column = self.col
+        field = u'{0}.{1}'.format(qn(table_alias), qn(column))
+        condition_column = u'{0}.{1}'.format(qn(table_alias), qn(self.condition_column))
+        placeholders = u', '.join(['%s'] * len(self.values))
+
+        if self.negate:
+            condition = u'({0} IS NULL OR {0} NOT IN ({1}))'.format(condition_column, placeholders)
+        else:
+            condition = u'{0} IN ({1})'.format(condition_column, placeholders)
+
+        sql = self.sql_template % {'function': self.sql_function, 'condition': condition, 'field': field}
+        return sql, self.values
+
+
+class ConditionalSum(Aggregate):
+    """
+    Sums the values of a field in the rows where another field has one of the given values.
+
+    If negate is True, the rows where the other field has none of the given values, or is NULL, are summed. The sum is
+    NULL if no rows match.
+
+    Example:
+        queryset.values('date').annotate(female=ConditionalSum('count', 'gender', ['f']))
+    """
+
+    name = 'ConditionalSum'
+
+    def __init__(self, lookup, condition_field, values, negate=False):
+        if not values:
+            raise ValueError('At least one value must be provided.')
+
+        super(ConditionalSum, self).__init__(lookup, condition_field=condition_field, values=values, negate=negate)
+
+    def add_to_query(self, query, alias, col, source, is_summary):
+        # pylint: disable=protected-access
+        extra = dict(self.extra)
+        condition_column = query.model._meta.get_field(extra.pop('condition_field')).column
+        query.aggregates[alias] = SQLConditionalSum(col, condition_column, source=source, is_summary=is_summary,
+                                                    **extra)
@@ -0,0 +1,73 @@
+"""
+Helpers for caching data derived from the tables managed by the data pipeline.
+
+Every table has a data version, stored in the cache, that is embedded in the keys of everything cached from that table.
+Bumping the version of a table (e.g. after the pipeline loads new data) invalidates all of those entries at once,
+without needing to know which keys were created.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+
+
+def _get_data_version_key(table):
+    return u'data_version:{0}'.format(table)
+
+
+def _get_timestamp():
+    """ Returns the current time in milliseconds. """
+    return int(time.time() * 1000)
+
+
+def get_data_version(table):
+    """
+    Returns the current data version of the given table.
+
+    Versions are initialized from the current time so that versions issued after the cache is flushed or the key is
+    evicted do not collide with those embedded in keys that may still be cached.
+    """
+    key = _get_data_version_key(table)
+    version = cache.get(key)
+
+    if version is None:
+        version = _get_timestamp()
+
+        # Another process may have initialized the version in the meantime. If so, use that value.
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+
+    return version
+
+
+def get_data_version_age(version):
+    """ Returns the number of seconds since the given data version was issued. """
+    return (_get_timestamp() - version) / 1000.0
+
+
+def bump_data_version(*tables):
+    """
+    Invalidates everything cached from the given tables.
+
+    Versions are advanced to a later second, even if they were bumped less than a second ago, so that the second of the
+    version (e.g. sent as Last-Modified, which has a resolution of one second) also changes with each bump.
+    """
+    for table in tables:
+        key = _get_data_version_key(table)
+        version = cache.get(key) or 0
+        cache.set(key, max((version // 1000 + 1) * 1000, _get_timestamp()), None)
+
+
+def make_digest(*parts):
+    """ Returns a hex digest uniquely identifying the given parts. """
+    return hashlib.md5(u'|'.join([unicode(part) for part in parts]).encode('utf-8')).hexdigest()
+
+
+def make_cache_key(prefix, *parts):
+    """
+    Returns a cache key built from the given parts.
+
+    The parts are hashed to keep the key short and free of characters that are not supported by all cache backends.
+    """
+    return u'{0}:{1}'.format(prefix, make_digest(*parts))
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 
 from analytics_data_api.constants import country, genders
+from analytics_data_api.v0.caching import bump_data_version
 
 
 class CourseActivityWeekly(models.Model):
@@ -22,7 +25,8 @@ class CourseActivityWeekly(models.Model):
     @classmethod
     def get_most_recent(cls, course_id, activity_type):
         """Activity for the week that was mostly recently computed."""
-        return cls.objects.filter(course_id=course_id, activity_type=activity_type).latest('interval_end')
+        manager = cls.objects.db_manager(hints={'course_id': course_id})
+        return manager.filter(course_id=course_id, activity_type=activity_type).latest('interval_end')
 
 
 class BaseCourseEnrollment(models.Model):
@@ -153,3 +157,44 @@ class SequentialOpenDistribution(models.Model):
     course_id = models.CharField(db_index=True, max_length=255)
     count = models.IntegerField()
     created = models.DateTimeField(auto_now_add=True)
+
+
+class CourseLatestDate(models.Model):
+    """
+    The latest date for which a table has data for a course.
+
+    Views use this to find the latest data for a course without aggregating over the course's rows. It is populated by
+    the update_latest_dates management command, which must be run after each pipeline load.
+    """
+
+    class Meta(object):
+        db_table = 'course_latest_date'
+        unique_together = [('table_name', 'course_id')]
+
+    table_name = models.CharField(max_length=255)
+    course_id = models.CharField(max_length=255)
+    latest_date = models.DateTimeField()
+
+
+@receiver(post_save, sender=CourseActivityWeekly)
+@receiver(post_save, sender=CourseEnrollmentDaily)
+@receiver(post_save, sender=CourseEnrollmentModeDaily)
+@receiver(post_save, sender=CourseEnrollmentByBirthYear)
+@receiver(post_save, sender=CourseEnrollmentByEducation)
+@receiver(post_save, sender=CourseEnrollmentByGender)
+@receiver(post_save, sender=ProblemResponseAnswerDistribution)
+@receiver(post_save, sender=CourseEnrollmentByCountry)
+@receiver(post_save, sender=GradeDistribution)
+@receiver(post_save, sender=SequentialOpenDistribution)
+def invalidate_cached_data(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate cached data when a row is saved through the ORM.
+
+    The data pipeline writes directly to the database, so the invalidate_api_cache management command must be run after
+    each load. This handler keeps the cache consistent with rows created by fixtures and management commands, which must
+    bump the data version themselves when they delete rows.
+
+    It is connected to each model of course data, rather than to every model, and not to post_delete: a delete listener
+    would prevent Django from deleting rows in bulk, and load every deleted row instead.
+    """
+    bump_data_version(sender._meta.db_table)  # pylint: disable=protected-access
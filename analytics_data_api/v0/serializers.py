@@ -1,5 +1,11 @@
+import datetime
+from decimal import Decimal
+
 from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.datastructures import SortedDict
 from rest_framework import serializers
+from rest_framework.fields import is_simple_callable
 
 from analytics_data_api.constants import enrollment_modes, genders
 from analytics_data_api.v0 import models
@@ -8,8 +14,119 @@ from analytics_data_api.v0 import models
 # Below are the enrollment modes supported by this API. The audit and honor enrollment modes are merged into honor.
 ENROLLMENT_MODES = [enrollment_modes.HONOR, enrollment_modes.PROFESSIONAL, enrollment_modes.VERIFIED]
 
+# Fields serialized by the generic Field.to_native, which returns values of these types unchanged
+_GENERIC_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.FloatField, serializers.BooleanField)
+_UNCHANGED_TYPES = frozenset([type(None), bool, int, long, float, unicode, Decimal, datetime.datetime, datetime.date,
+                              datetime.time])
+
+# Fields whose formatting only depends on the value, and can therefore be cached
+_FORMATTED_FIELDS = (serializers.DateField, serializers.DateTimeField)
+
+
+def _get_value(obj, source):
+    """ Returns the value of a single-component source, as rest_framework.fields.get_component does. """
+    value = obj.get(source) if isinstance(obj, dict) else getattr(obj, source)
+
+    if callable(value) and is_simple_callable(value):
+        value = value()
+
+    return value
+
+
+def _compile_field(serializer, field_name, field):
+    """ Returns a function returning the serialized value of the given field of a row. """
+    field.initialize(parent=serializer, field_name=field_name)
+    source = field.source or field_name
+    field_type = type(field)
+
+    if source == '*' or '.' in source:
+        compiled = lambda obj: field.field_to_native(obj, field_name)
+    elif field_type in _GENERIC_FIELDS:
+        def compiled(obj):
+            value = _get_value(obj, source)
+            return value if type(value) in _UNCHANGED_TYPES else field.to_native(value)
+    elif field_type in _FORMATTED_FIELDS:
+        # Most rows share the same few dates (e.g. the date the data was computed), so each is only formatted once.
+        formatted = {}
+
+        def compiled(obj):
+            value = _get_value(obj, source)
+            # Equal datetimes in different time zones are formatted differently.
+            key = (value, getattr(value, 'tzinfo', None))
+            try:
+                return formatted[key]
+            except KeyError:
+                formatted[key] = field.to_native(value)
+                return formatted[key]
+            except TypeError:
+                # Unhashable values, or naive and aware datetimes, which cannot be compared
+                return field.to_native(value)
+    elif isinstance(field, serializers.BaseSerializer) and not field.many:
+        def compiled(obj):
+            try:
+                value = _get_value(obj, source)
+            except ObjectDoesNotExist:
+                return None
+
+            if value is None:
+                return None
+            if hasattr(value, 'all'):
+                return field.field_to_native(obj, field_name)
+            return field.to_native(value)
+    else:
+        compiled = lambda obj: field.field_to_native(obj, field_name)
+
+    transform = getattr(serializer, 'transform_%s' % field_name, None)
+    if callable(transform):
+        untransformed = compiled
+        compiled = lambda obj: transform(obj, untransformed(obj))
+
+    return compiled
+
+
+def compile_serializer(serializer):
+    """
+    Returns a function that serializes a row to the same data as serializer.to_native.
+
+    The fields, their sources and their transforms are resolved once, instead of for every row, and field types with
+    known behavior are serialized directly. The returned data does not include the field metadata used to render
+    forms.
+    """
+    fields = []
+
+    for field_name, field in serializer.fields.items():
+        if not getattr(field, 'write_only', False):
+            fields.append((serializer.get_field_key(field_name), _compile_field(serializer, field_name, field)))
+
+    def to_native(obj):
+        ret = SortedDict()
+        for key, compiled in fields:
+            ret[key] = compiled(obj)
+        return ret
+
+    return to_native
+
+
+class CompiledSerializerMixin(object):
+    """
+    Serializes rows with a function compiled, on first use, from the serializer's fields.
+
+    Fields must not be changed after the first row is serialized.
+    """
+
+    _compiled = None
+
+    def to_native(self, obj):
+        if obj is None:
+            return super(CompiledSerializerMixin, self).to_native(obj)
+
+        if self._compiled is None:
+            self._compiled = compile_serializer(self)
+
+        return self._compiled(obj)
+
 
-class CourseActivityByWeekSerializer(serializers.ModelSerializer):
+class CourseActivityByWeekSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
     """
     Representation of CourseActivityByWeek that excludes the id field.
 
@@ -35,11 +152,11 @@ class CourseActivityByWeekSerializer(serializers.ModelSerializer):
         fields = ('interval_start', 'interval_end', 'activity_type', 'count', 'course_id')
 
 
-class ModelSerializerWithCreatedField(serializers.ModelSerializer):
+class ModelSerializerWithCreatedField(CompiledSerializerMixin, serializers.ModelSerializer):
     created = serializers.DateTimeField(format=settings.DATETIME_FORMAT)
 
 
-class ProblemSubmissionCountSerializer(serializers.Serializer):
+class ProblemSubmissionCountSerializer(CompiledSerializerMixin, serializers.Serializer):
     """
     Serializer for problem submission counts.
     """
@@ -49,6 +166,14 @@ class ProblemSubmissionCountSerializer(serializers.Serializer):
     correct = serializers.IntegerField(default=0)
 
 
+class CourseProblemSerializer(ProblemSubmissionCountSerializer):
+    """
+    Serializer for the submission counts of the problems in a course.
+    """
+
+    percent_correct = serializers.FloatField(default=0)
+
+
 class ProblemResponseAnswerDistributionSerializer(ModelSerializerWithCreatedField):
     """
     Representation of the Answer Distribution table, without id.
@@ -148,7 +273,7 @@ class CourseEnrollmentModeDailySerializer(BaseCourseEnrollmentModelSerializer):
         fields = ['course_id', 'date', 'count', 'created'] + ENROLLMENT_MODES
 
 
-class CountrySerializer(serializers.Serializer):
+class CountrySerializer(CompiledSerializerMixin, serializers.Serializer):
     """
     Serialize country to an object with fields for the complete country name
     and the ISO-3166 two- and three-digit codes.
@@ -204,7 +329,7 @@ class CourseEnrollmentByBirthYearSerializer(BaseCourseEnrollmentModelSerializer)
         fields = ('course_id', 'date', 'birth_year', 'count', 'created')
 
 
-class CourseActivityWeeklySerializer(serializers.ModelSerializer):
+class CourseActivityWeeklySerializer(CompiledSerializerMixin, serializers.ModelSerializer):
     interval_start = serializers.DateTimeField(format=settings.DATETIME_FORMAT)
     interval_end = serializers.DateTimeField(format=settings.DATETIME_FORMAT)
     any = serializers.IntegerField(required=False)
@@ -0,0 +1,115 @@
+"""
+Maps courses to the databases that hold their data.
+
+By default, all of the data is held by ANALYTICS_DATABASE. If ANALYTICS_DATABASE_SHARDS is configured, the data is
+split by course across several databases, and the queries for a course are routed (see AnalyticsApiRouter) to the
+database that holds it. Queries that are not limited to a course, such as those for problems, are run against every
+database, and their results combined.
+
+ANALYTICS_DATABASE_SHARDS is configured like a cache backend, with the path of a shard map class and its options:
+
+    ANALYTICS_DATABASE_SHARDS = {
+        'CLASS': 'analytics_data_api.v0.sharding.HashShardMap',
+        'OPTIONS': {'databases': ['analytics_1', 'analytics_2']},
+    }
+"""
+
+import zlib
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+
+class HashShardMap(object):
+    """ Spreads courses evenly across the given databases, by a hash of their IDs. """
+
+    def __init__(self, databases):
+        self.databases = list(databases)
+
+    def get_database(self, course_id):
+        # The CRC is stable across processes and Python versions, unlike hash().
+        return self.databases[(zlib.crc32(course_id.encode('utf-8')) & 0xffffffff) % len(self.databases)]
+
+    def get_databases(self):
+        return list(self.databases)
+
+
+class ExplicitShardMap(object):
+    """
+    Maps courses, or the organizations that offer them, to databases.
+
+    The data of courses that are not mapped, either by ID or by organization, is held by the default database, which
+    defaults to ANALYTICS_DATABASE.
+    """
+
+    def __init__(self, courses=None, orgs=None, default=None):
+        self.courses = courses or {}
+        self.orgs = orgs or {}
+        self.default = default or getattr(settings, 'ANALYTICS_DATABASE', 'default')
+
+    def get_database(self, course_id):
+        database = self.courses.get(course_id)
+
+        if database is None and self.orgs:
+            try:
+                database = self.orgs.get(CourseKey.from_string(course_id).org)
+            except InvalidKeyError:
+                pass
+
+        return database or self.default
+
+    def get_databases(self):
+        return sorted(set(self.courses.values() + self.orgs.values() + [self.default]))
+
+
+_shard_map = (None, None)
+
+
+def get_shard_map():
+    """ Returns the configured shard map, or None if the data is not sharded. """
+    global _shard_map  # pylint: disable=global-statement
+    config = settings.ANALYTICS_DATABASE_SHARDS
+
+    if config is None:
+        return None
+
+    # The shard map is built again if the setting changes (e.g. in tests).
+    if _shard_map[0] is not config:
+        _shard_map = (config, import_string(config['CLASS'])(**config.get('OPTIONS', {})))
+
+    return _shard_map[1]
+
+
+def get_course_database(course_id):
+    """ Returns the database that holds the data of the course. """
+    shard_map = get_shard_map()
+
+    if shard_map is None:
+        return getattr(settings, 'ANALYTICS_DATABASE', 'default')
+    return shard_map.get_database(course_id)
+
+
+def get_databases():
+    """ Returns the databases that hold the data, excluding their replicas. """
+    shard_map = get_shard_map()
+
+    if shard_map is None:
+        return [getattr(settings, 'ANALYTICS_DATABASE', 'default')]
+    return shard_map.get_databases()
+
+
+def scatter(queryset):
+    """
+    Returns a copy of the queryset for each database that may hold some of its data.
+
+    If the data is not sharded, the queryset itself is returned, and the database it is run against is chosen by the
+    router as usual.
+    """
+    shard_map = get_shard_map()
+
+    if shard_map is None:
+        return [queryset]
+
+    return [queryset.using(database) for database in shard_map.get_databases()]
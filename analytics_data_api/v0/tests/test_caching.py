@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.deletion import Collector
+from django.test import TestCase
+from django_dynamic_fixture import G
+
+from analytics_data_api.v0 import caching, models
+
+
+class DataVersionTests(TestCase):
+    table = models.CourseEnrollmentDaily._meta.db_table  # pylint: disable=protected-access,no-member
+
+    def setUp(self):
+        super(DataVersionTests, self).setUp()
+        cache.clear()
+
+    def test_get_data_version(self):
+        version = caching.get_data_version(self.table)
+        self.assertIsNotNone(version)
+        self.assertEqual(caching.get_data_version(self.table), version)
+
+    def test_bump_data_version(self):
+        version = caching.get_data_version(self.table)
+        other_version = caching.get_data_version('other_table')
+
+        caching.bump_data_version(self.table)
+        self.assertGreater(caching.get_data_version(self.table), version)
+        self.assertEqual(caching.get_data_version('other_table'), other_version)
+
+    def test_bump_data_version_seconds(self):
+        # Versions bumped within the same second are still in different seconds (e.g. for Last-Modified).
+        seconds = set()
+        for _index in range(3):
+            caching.bump_data_version(self.table)
+            seconds.add(caching.get_data_version(self.table) // 1000)
+        self.assertEqual(len(seconds), 3)
+
+    def test_save_bumps_data_version(self):
+        version = caching.get_data_version(self.table)
+        G(models.CourseEnrollmentDaily)
+        self.assertGreater(caching.get_data_version(self.table), version)
+
+    def test_fast_delete(self):
+        # Rows are deleted in bulk, without being loaded, since no delete signal is connected.
+        G(models.CourseEnrollmentDaily)
+        self.assertTrue(Collector(DEFAULT_DB_ALIAS).can_fast_delete(models.CourseEnrollmentDaily.objects.all()))
+
+    def test_make_cache_key(self):
+        key = caching.make_cache_key('response', u'edX/DemoX/Demo_Course', u'Caf\xe9', 1)
+        self.assertTrue(key.startswith('response:'))
+        self.assertEqual(key, caching.make_cache_key('response', u'edX/DemoX/Demo_Course', u'Caf\xe9', 1))
+        self.assertNotEqual(key, caching.make_cache_key('response', u'edX/DemoX/Demo_Course', u'Caf\xe9', 2))
@@ -0,0 +1,68 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+from django_dynamic_fixture import G
+from rest_framework import serializers as rest_serializers
+
+from analytics_data_api.constants.country import get_country
+from analytics_data_api.v0 import models, serializers
+
+
+class CompiledSerializerTests(TestCase):
+    def assertSerializedIdentically(self, serializer, obj):
+        expected = rest_serializers.BaseSerializer.to_native(serializer, obj)
+        actual = serializer.to_native(obj)
+        self.assertListEqual(actual.items(), expected.items())
+
+    def test_model_instances(self):
+        created = datetime.datetime(2014, 2, 1, 10, 30, 15, 123, tzinfo=timezone.utc)
+        instances = [
+            G(models.CourseEnrollmentDaily, date=datetime.date(2014, 1, 1), created=created),
+            G(models.CourseEnrollmentDaily, date=datetime.date(2014, 1, 2), created=created),
+        ]
+        serializer = serializers.CourseEnrollmentDailySerializer()
+
+        for instance in instances:
+            self.assertSerializedIdentically(serializer, instance)
+
+    def test_values(self):
+        serializer = serializers.CourseEnrollmentByGenderSerializer()
+        row = {'course_id': u'edX/DemoX/Demo_Course', 'date': datetime.date(2014, 1, 1), 'female': 10, 'male': None,
+               'other': 3L, 'unknown': 0, 'created': datetime.datetime(2014, 2, 1, 10, 30)}
+        self.assertSerializedIdentically(serializer, row)
+
+    def test_nested_serializer(self):
+        serializer = serializers.CourseEnrollmentByCountrySerializer()
+        row = {'course_id': u'edX/DemoX/Demo_Course', 'date': datetime.date(2014, 1, 1), 'count': 10,
+               'created': datetime.datetime(2014, 2, 1, 10, 30)}
+
+        for code in ('US', 'UNKNOWN'):
+            row['country'] = get_country(code)
+            self.assertSerializedIdentically(serializer, row)
+
+    def test_method_fields(self):
+        serializer = serializers.CourseActivityByWeekSerializer()
+        instance = G(models.CourseActivityWeekly, activity_type='ACTIVE',
+                     interval_start=datetime.datetime(2014, 1, 1, tzinfo=timezone.utc),
+                     interval_end=datetime.datetime(2014, 1, 8, tzinfo=timezone.utc))
+        self.assertSerializedIdentically(serializer, instance)
+
+    def test_projected_fields(self):
+        serializer = serializers.ProblemSubmissionCountSerializer()
+        del serializer.fields['total']  # pylint: disable=no-member
+        row = {'module_id': 'i4x://a/b/problem/c', 'total': 10, 'correct': None}
+        self.assertSerializedIdentically(serializer, row)
+        self.assertListEqual(serializer.to_native(row).keys(), ['module_id', 'correct'])
+
+    def test_formatted_values(self):
+        """ Equal values that are formatted differently should not share a formatted value. """
+        serializer = serializers.CourseEnrollmentDailySerializer()
+        naive = datetime.datetime(2014, 2, 1, 10, 30)
+        aware = timezone.make_aware(naive, timezone.utc)
+        offset = aware.astimezone(timezone.get_fixed_timezone(60))
+
+        for created in (naive, aware, offset):
+            row = {'course_id': u'edX/DemoX/Demo_Course', 'date': datetime.date(2014, 1, 1), 'count': 1,
+                   'created': created}
+            self.assertSerializedIdentically(serializer, row)
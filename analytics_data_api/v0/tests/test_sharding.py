@@ -0,0 +1,74 @@
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from analytics_data_api.v0 import models, sharding
+
+HASH_SHARDS = {
+    'CLASS': 'analytics_data_api.v0.sharding.HashShardMap',
+    'OPTIONS': {'databases': ['shard_1', 'shard_2']},
+}
+
+EXPLICIT_SHARDS = {
+    'CLASS': 'analytics_data_api.v0.sharding.ExplicitShardMap',
+    'OPTIONS': {
+        'courses': {'edX/DemoX/Demo_Course': 'shard_1'},
+        'orgs': {'edX': 'shard_2', 'MITx': 'shard_3'},
+    },
+}
+
+
+class HashShardMapTests(TestCase):
+    def test_get_database(self):
+        shard_map = sharding.HashShardMap(['shard_1', 'shard_2', 'shard_3'])
+        course_ids = [u'edX/DemoX{0}/Demo_Course'.format(index) for index in range(30)]
+        databases = [shard_map.get_database(course_id) for course_id in course_ids]
+
+        # Courses are spread across every database, and always mapped to the same one.
+        self.assertEqual(set(databases), {'shard_1', 'shard_2', 'shard_3'})
+        self.assertEqual(databases, [shard_map.get_database(course_id) for course_id in course_ids])
+        self.assertEqual(shard_map.get_database(u'edX/DemoX/Demo_Course'), 'shard_3')
+
+    def test_get_databases(self):
+        self.assertEqual(sharding.HashShardMap(['shard_1', 'shard_2']).get_databases(), ['shard_1', 'shard_2'])
+
+
+class ExplicitShardMapTests(TestCase):
+    def setUp(self):
+        self.shard_map = sharding.ExplicitShardMap(**EXPLICIT_SHARDS['OPTIONS'])
+
+    def test_get_database(self):
+        self.assertEqual(self.shard_map.get_database(u'edX/DemoX/Demo_Course'), 'shard_1')
+        self.assertEqual(self.shard_map.get_database(u'edX/Other/Demo_Course'), 'shard_2')
+        self.assertEqual(self.shard_map.get_database(u'course-v1:MITx+6.002x+2014'), 'shard_3')
+        self.assertEqual(self.shard_map.get_database(u'HarvardX/Demo/Course'), 'default')
+        self.assertEqual(self.shard_map.get_database(u'not a course'), 'default')
+
+    def test_get_databases(self):
+        self.assertEqual(self.shard_map.get_databases(), ['default', 'shard_1', 'shard_2', 'shard_3'])
+
+    @override_settings(ANALYTICS_DATABASE='analytics')
+    def test_default(self):
+        self.assertEqual(sharding.ExplicitShardMap().get_database(u'edX/DemoX/Demo_Course'), 'analytics')
+        self.assertEqual(sharding.ExplicitShardMap(default='shard_1').get_databases(), ['shard_1'])
+
+
+class ShardingTests(TestCase):
+    def test_not_sharded(self):
+        self.assertIsNone(sharding.get_shard_map())
+        self.assertEqual(sharding.get_course_database(u'edX/DemoX/Demo_Course'), 'default')
+        self.assertEqual(sharding.get_databases(), ['default'])
+
+        queryset = models.CourseEnrollmentDaily.objects.all()
+        self.assertEqual(sharding.scatter(queryset), [queryset])
+
+    @override_settings(ANALYTICS_DATABASE_SHARDS=EXPLICIT_SHARDS)
+    def test_sharded(self):
+        self.assertIsInstance(sharding.get_shard_map(), sharding.ExplicitShardMap)
+        self.assertEqual(sharding.get_course_database(u'edX/DemoX/Demo_Course'), 'shard_1')
+        self.assertEqual(sharding.get_databases(), ['default', 'shard_1', 'shard_2', 'shard_3'])
+
+        querysets = sharding.scatter(models.CourseEnrollmentDaily.objects.filter(count=1))
+        self.assertEqual([queryset.db for queryset in querysets], ['default', 'shard_1', 'shard_2', 'shard_3'])
+
+        with override_settings(ANALYTICS_DATABASE_SHARDS=HASH_SHARDS):
+            self.assertIsInstance(sharding.get_shard_map(), sharding.HashShardMap)
@@ -7,10 +7,17 @@ import StringIO
 import csv
 import datetime
 from itertools import groupby
+import json
+import time
 import urllib
 
 from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F, Max
+from django.test import TestCase
+from django.test.utils import override_settings
 from django_dynamic_fixture import G
+import mock
 import pytz
 
 from analytics_data_api.constants.country import get_country
@@ -19,6 +26,8 @@ from analytics_data_api.constants import country, enrollment_modes, genders
 from analytics_data_api.v0.models import CourseActivityWeekly
 from analytics_data_api.v0.tests.utils import flatten
 from analytics_data_api.v0.tests.views import DemoCourseMixin, DEMO_COURSE_ID
+from analytics_data_api.v0.views import iterate_unbuffered
+from analytics_data_api.v0.views.courses import BaseCourseView
 from analyticsdataserver.tests import TestCaseWithAuthentication
 
 
@@ -43,6 +52,7 @@ class CourseViewTestCaseMixin(DemoCourseMixin):
     path = None
     order_by = []
     csv_filename_slug = None
+    paginated = True
 
     def generate_data(self, course_id=None):
         raise NotImplementedError
@@ -96,6 +106,7 @@ class CourseViewTestCaseMixin(DemoCourseMixin):
         self.assertEquals(response.status_code, 200)
         self.assertEquals(response['Content-Type'].split(';')[0], csv_content_type)
         self.assertEquals(response['Content-Disposition'], u'attachment; filename={}'.format(filename))
+        self.assertTrue(response.streaming)
 
         # Validate the actual data
         data = self.format_as_response(*self.get_latest_data(course_id=course_id))
@@ -109,7 +120,150 @@ class CourseViewTestCaseMixin(DemoCourseMixin):
         writer = csv.DictWriter(expected, fieldnames)
         writer.writeheader()
         writer.writerows(data)
-        self.assertEqual(response.content, expected.getvalue())
+        self.assertEqual(''.join(response.streaming_content), expected.getvalue())
+
+    def test_get_cached(self):
+        """ Verify responses are cached until the data version of the table is bumped. """
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        response = self.authenticated_get(path)
+        self.assertEquals(response.status_code, 200)
+
+        # Updates made with QuerySet.update() do not send signals, similar to a load by the data pipeline.
+        self.model.objects.update(count=F('count') + 1)
+        self.assertEquals(self.authenticated_get(path).content, response.content)
+
+        call_command('invalidate_api_cache', self.model._meta.db_table)  # pylint: disable=protected-access
+        self.assertNotEquals(self.authenticated_get(path).content, response.content)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_get_cache_disabled(self):
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        response = self.authenticated_get(path)
+        self.model.objects.update(count=F('count') + 1)
+        self.assertNotEquals(self.authenticated_get(path).content, response.content)
+
+    def test_get_fields(self):
+        """ Verify the endpoint only returns the requested fields. """
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        response = self.authenticated_get(path, {'fields': 'course_id,created'})
+        self.assertEquals(response.status_code, 200)
+
+        expected = [dict((name, item[name]) for name in ('course_id', 'created'))
+                    for item in self.format_as_response(*self.get_latest_data())]
+        self.assertEquals(response.data, expected)
+
+        response = self.authenticated_get(path, {'fields': 'course_id,password'})
+        self.assertEquals(response.status_code, 400)
+
+    def test_get_streamed_json(self):
+        """ Verify JSON streamed on request is identical to the JSON rendered by default. """
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        expected = self.authenticated_get(path).content
+
+        response = self.authenticated_get(path, {'format': 'json-stream'})
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEquals(response['Content-Type'], 'application/json')
+        self.assertEquals(''.join(response.streaming_content), expected)
+
+    def get_all_pages(self, path, data):
+        """ Returns the data of every page of results, following the Link headers, and the number of pages. """
+        results = []
+        pages = 0
+        response = self.authenticated_get(path, data)
+
+        while True:
+            self.assertEquals(response.status_code, 200)
+            # Cached responses are not deserialized by the test client.
+            results += json.loads(response.content)
+            pages += 1
+
+            if not response.has_header('Link'):
+                return results, pages
+
+            self.assertTrue(response['Link'].endswith('>; rel="next"'))
+            response = self.authenticated_get(response['Link'][1:-len('>; rel="next"')])
+
+    def test_get_paginated(self):
+        """ Verify the pages of results, combined, are identical to the unpaginated results. """
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        expected = json.loads(self.authenticated_get(path, {'start_date': '2000-01-01'}).content)
+
+        results, pages = self.get_all_pages(path, {'start_date': '2000-01-01', 'page_size': 1})
+        self.assertEquals(results, expected)
+        self.assertEquals(pages, len(expected) if self.paginated else 1)
+
+        # Cached pages should also link to the next page.
+        self.assertEquals(self.get_all_pages(path, {'start_date': '2000-01-01', 'page_size': 1}), (results, pages))
+
+    def test_get_paginated_invalid(self):
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+
+        for data in ({'page_size': 0}, {'page_size': 'all'}, {'page_size': 1, 'cursor': 'invalid'}):
+            response = self.authenticated_get(path, data)
+            self.assertEquals(response.status_code, 400 if self.paginated else 200)
+
+    def test_get_conditional(self):
+        """ Verify the endpoint answers conditional requests with a 304 until the data changes. """
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        response = self.authenticated_get(path)
+        self.assertEquals(response.status_code, 200)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+
+        with self.assertNumQueries(0):
+            response = self.authenticated_get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 304)
+        self.assertEquals(response['ETag'], etag)
+
+        response = self.authenticated_get(path, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEquals(response.status_code, 304)
+
+        # Representations in other formats have different ETags.
+        response = self.authenticated_get(path, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT='text/csv')
+        self.assertEquals(response.status_code, 200)
+
+        call_command('invalidate_api_cache', self.model._meta.db_table)  # pylint: disable=protected-access
+        response = self.authenticated_get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+        self.assertNotEquals(response['ETag'], etag)
+
+        # Last-Modified changes with each bump, even within the same second.
+        call_command('invalidate_api_cache', self.model._meta.db_table)  # pylint: disable=protected-access
+        response = self.authenticated_get(path, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEquals(response.status_code, 200)
+        self.assertNotEquals(response['Last-Modified'], last_modified)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_get_query_count(self):
+        """ Verify the endpoint retrieves data with a single query. """
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+
+        # Authenticate once so that the token is cached.
+        self.authenticated_get(path)
+
+        with self.assertNumQueries(1):
+            response = self.authenticated_get(path)
+        self.assertEquals(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.authenticated_get(path, {'start_date': '2014-01-01'})
+        self.assertEquals(response.status_code, 200)
+
+        # Empty results for a date range require checking whether the course exists.
+        with self.assertNumQueries(2):
+            response = self.authenticated_get(path, {'start_date': '2100-01-01'})
+        self.assertEquals(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.authenticated_get(u'{0}courses/{1}{2}'.format(self.api_root_path, 'edX/DemoX/Non_Existent',
+                                                                          self.path))
+        self.assertEquals(response.status_code, 404)
+
+    def test_get_recorded_latest_date(self):
+        """ Verify the endpoint uses the latest date recorded by the update_latest_dates command. """
+        call_command('update_latest_dates', self.model._meta.db_table)  # pylint: disable=protected-access
+        self.test_get()
 
     def test_get_csv(self):
         """ Verify the endpoint returns data that has been properly converted to CSV. """
@@ -168,6 +322,24 @@ class CourseEnrollmentViewTestCaseMixin(CourseViewTestCaseMixin):
         expected = self.format_as_response(*self.model.objects.filter(date=self.date))
         self.assertIntervalFilteringWorks(expected, self.date, self.date + datetime.timedelta(days=1))
 
+    def test_get_granularity(self):
+        """ Verify the endpoint returns the data of the last date of each period. """
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        daily = self.authenticated_get(path, {'start_date': '2000-01-01'}).data
+
+        response = self.authenticated_get(path, {'start_date': '2000-01-01', 'granularity': 'day'})
+        self.assertEquals(response.data, daily)
+
+        # The data is of January 1st and, for most endpoints, of several dates in December.
+        last_dates = [self.model.objects.filter(date__lt=self.date).aggregate(Max('date'))['date__max'], self.date]
+        last_dates = [date.strftime(settings.DATE_FORMAT) for date in last_dates if date]
+        response = self.authenticated_get(path, {'start_date': '2000-01-01', 'granularity': 'month'})
+        self.assertEquals(response.status_code, 200)
+        self.assertListEqual(response.data, [item for item in daily if item['date'] in last_dates])
+
+        response = self.authenticated_get(path, {'start_date': '2000-01-01', 'granularity': 'year'})
+        self.assertEquals(response.status_code, 400)
+
 
 class CourseActivityLastWeekTest(DemoCourseMixin, TestCaseWithAuthentication):
     def generate_data(self, course_id=None):
@@ -308,6 +480,17 @@ class CourseEnrollmentByEducationViewTests(CourseEnrollmentViewTestCaseMixin, Te
              'education_level': ce.education_level, 'created': ce.created.strftime(settings.DATETIME_FORMAT)} for
             ce in args]
 
+    def test_get_paginated_null(self):
+        """ Verify results are paginated across rows with a NULL cursor field. """
+        G(self.model, course_id=self.course_id, date=self.date, education_level=None)
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        expected = json.loads(self.authenticated_get(path, {'start_date': '2000-01-01'}).content)
+        self.assertIn(None, [item['education_level'] for item in expected])
+
+        results, pages = self.get_all_pages(path, {'start_date': '2000-01-01', 'page_size': 1})
+        self.assertEquals(results, expected)
+        self.assertEquals(pages, len(expected))
+
 
 class CourseEnrollmentByGenderViewTests(CourseEnrollmentViewTestCaseMixin, DefaultFillTestMixin,
                                         TestCaseWithAuthentication):
@@ -374,6 +557,13 @@ class CourseEnrollmentByGenderViewTests(CourseEnrollmentViewTestCaseMixin, Defau
         expected = [expected]
         self.assertViewReturnsExpectedData(expected)
 
+    def test_unexpected_gender(self):
+        """ Verify genders other than those expected are counted as unknown. """
+        G(self.model, course_id=self.course_id, date=self.date, gender='x', count=5)
+        response = self.authenticated_get('/api/v0/courses/%s%s' % (self.course_id, self.path,))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.data[0][genders.UNKNOWN], 105)
+
 
 class CourseEnrollmentViewTests(CourseEnrollmentViewTestCaseMixin, TestCaseWithAuthentication):
     model = models.CourseEnrollmentDaily
@@ -395,6 +585,198 @@ class CourseEnrollmentViewTests(CourseEnrollmentViewTestCaseMixin, TestCaseWithA
              'created': ce.created.strftime(settings.DATETIME_FORMAT)}
             for ce in args]
 
+    def test_get_recorded_latest_date(self):
+        super(CourseEnrollmentViewTests, self).test_get_recorded_latest_date()
+
+        # The recorded date is used even if it is not the latest date in the table.
+        date = self.date - datetime.timedelta(days=5)
+        models.CourseLatestDate.objects.filter(course_id=self.course_id).update(
+            latest_date=datetime.datetime.combine(date, datetime.time()).replace(tzinfo=pytz.utc))
+        call_command('invalidate_api_cache', self.model._meta.db_table)  # pylint: disable=protected-access
+        self.assertViewReturnsExpectedData(self.format_as_response(*self.model.objects.filter(date=date)))
+
+    @override_settings(ANALYTICS_DATABASE_REPLICAS={'replica': 1}, ANALYTICS_REPLICA_MAX_LAG=60)
+    def test_get_after_bump(self):
+        """ Verify data is read from the primary until replicas have had time to replicate the new version. """
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        call_command('invalidate_api_cache', self.model._meta.db_table)  # pylint: disable=protected-access
+
+        with mock.patch('analyticsdataserver.router.choose_read_database', return_value='default') as choose:
+            self.assertEquals(self.authenticated_get(path).status_code, 200)
+            self.assertFalse(choose.called)
+
+            # Replicas are read from again once they have had time to replicate the new version.
+            with mock.patch('analytics_data_api.v0.caching.time.time', return_value=time.time() + 120):
+                self.assertEquals(self.authenticated_get(path, {'start_date': '2000-01-01'}).status_code, 200)
+            self.assertTrue(choose.called)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_get_granularity_periods(self):
+        for date in (datetime.date(2013, 11, 15), datetime.date(2013, 11, 28), datetime.date(2013, 12, 2),
+                     datetime.date(2013, 12, 5), datetime.date(2013, 12, 31)):
+            G(self.model, course_id=self.course_id, date=date, count=100)
+
+        path = u'{0}courses/{1}{2}'.format(self.api_root_path, self.course_id, self.path)
+        expected_dates = {
+            # Weeks start on Monday
+            'week': ['2013-11-15', '2013-11-28', '2013-12-05', '2013-12-27', '2014-01-01'],
+            'month': ['2013-11-28', '2013-12-31', '2014-01-01'],
+        }
+
+        # Authenticate once so that the token is cached.
+        self.authenticated_get(path)
+
+        for granularity, dates in expected_dates.items():
+            # The last dates are found with a separate query.
+            with self.assertNumQueries(2):
+                response = self.authenticated_get(path, {'start_date': '2013-11-01', 'granularity': granularity})
+            self.assertEquals(response.status_code, 200)
+            self.assertListEqual([item['date'] for item in response.data], dates)
+
+        # The last date of a period is the last date before the end date.
+        response = self.authenticated_get(path, {'start_date': '2013-11-01', 'end_date': '2013-12-31',
+                                                 'granularity': 'month'})
+        self.assertListEqual([item['date'] for item in response.data], ['2013-11-28', '2013-12-27'])
+
+        response = self.authenticated_get(path, {'start_date': '2014-02-01', 'granularity': 'month'})
+        self.assertEquals(response.status_code, 200)
+        self.assertListEqual(response.data, [])
+
+
+class BulkCourseEnrollmentViewTestMixin(DemoCourseMixin):
+    """ Verify the bulk endpoints return the same data as the endpoints of individual courses. """
+    path = None
+    model = None
+    other_course_id = u'edX/DemoX/Other_Course'
+
+    def generate_data(self, course_id, date):
+        raise NotImplementedError
+
+    def setUp(self):
+        super(BulkCourseEnrollmentViewTestMixin, self).setUp()
+        self.date = datetime.date(2014, 1, 1)
+        self.generate_data(self.course_id, self.date)
+        self.generate_data(self.course_id, self.date - datetime.timedelta(days=2))
+
+        # The latest date of the other course is earlier.
+        self.generate_data(self.other_course_id, self.date - datetime.timedelta(days=1))
+        self.generate_data(self.other_course_id, self.date - datetime.timedelta(days=3))
+
+    def get_course_data(self, course_id, data=None):
+        response = self.authenticated_get(u'/api/v0/courses/{0}{1}'.format(course_id, self.path), data)
+        self.assertEquals(response.status_code, 200)
+        return response.data
+
+    def assertValidResponse(self, response, data=None):
+        self.assertEquals(response.status_code, 200)
+        expected = {
+            self.course_id: self.get_course_data(self.course_id, data),
+            self.other_course_id: self.get_course_data(self.other_course_id, data),
+        }
+        self.assertDictEqual(json.loads(response.content), json.loads(json.dumps(expected)))
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_get(self):
+        path = u'/api/v0/courses{0}'.format(self.path)
+        course_ids = u','.join([self.course_id, self.other_course_id, u'edX/DemoX/Non_Existent_Course'])
+
+        # Authenticate once so that the token is cached.
+        self.authenticated_get(path, {'course_ids': course_ids})
+
+        # The latest dates of the courses are looked up first, then the data of those dates is retrieved. Courses that
+        # are not recorded in CourseLatestDate, such as the course that does not exist, are aggregated over in between.
+        call_command('update_latest_dates', self.model._meta.db_table)  # pylint: disable=protected-access
+        with self.assertNumQueries(3):
+            response = self.authenticated_get(path, {'course_ids': course_ids})
+        self.assertValidResponse(response)
+
+        data = {'course_ids': course_ids, 'start_date': '2013-12-30', 'fields': 'course_id,date,count'}
+        self.assertValidResponse(self.authenticated_get(path, data), data)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_get_sharded(self):
+        """ The data of courses held by different databases should be retrieved from each, and merged in order. """
+        path = u'/api/v0/courses{0}'.format(self.path)
+        data = {'course_ids': u','.join([self.course_id, self.other_course_id]), 'start_date': '2013-12-01'}
+        expected = json.loads(self.authenticated_get(path, data).content)
+
+        # Each course is held by a database of its own, emulated by the rows of the course in the test database.
+        with mock.patch('analytics_data_api.v0.sharding.get_course_database', side_effect=lambda course_id: course_id):
+            with mock.patch.object(BaseCourseView, 'get_course_model_queryset',
+                                   side_effect=lambda course_id: self.model.objects.filter(course_id=course_id)):
+                with self.assertNumQueries(2):
+                    response = self.authenticated_get(path, data)
+                csv_response = self.authenticated_get(path, data, HTTP_ACCEPT='text/csv')
+
+        self.assertEquals(response.status_code, 200)
+        self.assertDictEqual(json.loads(response.content), expected)
+
+        # The fields by which rows are merged are retrieved, even if they are not requested.
+        data['fields'] = 'count'
+        expected = json.loads(self.authenticated_get(path, data).content)
+        with mock.patch('analytics_data_api.v0.sharding.get_course_database', side_effect=lambda course_id: course_id):
+            with mock.patch('analytics_data_api.v0.sharding.get_databases', return_value=['shard_1', 'shard_2']):
+                with mock.patch.object(BaseCourseView, 'get_course_model_queryset',
+                                       side_effect=lambda course_id: self.model.objects.filter(course_id=course_id)):
+                    with self.assertNumQueries(2):
+                        response = self.authenticated_get(path, data)
+        self.assertDictEqual(json.loads(response.content), expected)
+
+        # Streamed rows are merged in the order of the dates.
+        rows = list(csv.DictReader(StringIO.StringIO(''.join(csv_response.streaming_content))))
+        self.assertListEqual([row['date'] for row in rows], sorted(row['date'] for row in rows))
+        self.assertEqual(len(rows), sum(len(course_data) for course_data in expected.values()))
+
+    def test_get_granularity(self):
+        """ The last date of each period should be that of each course. """
+        path = u'/api/v0/courses{0}'.format(self.path)
+        data = {'course_ids': u','.join([self.course_id, self.other_course_id]), 'start_date': '2013-12-01',
+                'granularity': 'week'}
+        self.assertValidResponse(self.authenticated_get(path, data), data)
+
+    def test_post(self):
+        path = u'/api/v0/courses{0}'.format(self.path)
+        response = self.client.post(path, json.dumps({'course_ids': [self.course_id, self.other_course_id]}),
+                                    content_type='application/json', HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.assertValidResponse(response)
+
+    def test_get_latest_dates_not_recorded(self):
+        """ The latest dates of courses not recorded in CourseLatestDate should be aggregated over. """
+        path = u'/api/v0/courses{0}'.format(self.path)
+        course_ids = u','.join([self.course_id, self.other_course_id])
+        call_command('update_latest_dates', self.model._meta.db_table)  # pylint: disable=protected-access
+        models.CourseLatestDate.objects.filter(course_id=self.other_course_id).delete()
+        call_command('invalidate_api_cache', self.model._meta.db_table)  # pylint: disable=protected-access
+        self.assertValidResponse(self.authenticated_get(path, {'course_ids': course_ids}))
+
+    def test_post_invalid_body(self):
+        path = u'/api/v0/courses{0}'.format(self.path)
+        for body in ([self.course_id], {'course_ids': 1}):
+            response = self.client.post(path, json.dumps(body), content_type='application/json',
+                                        HTTP_AUTHORIZATION='Token ' + self.token.key)
+            self.assertEquals(response.status_code, 400)
+
+    def test_get_without_course_ids(self):
+        response = self.authenticated_get(u'/api/v0/courses{0}'.format(self.path))
+        self.assertEquals(response.status_code, 406)
+
+
+class CourseEnrollmentBulkViewTests(BulkCourseEnrollmentViewTestMixin, TestCaseWithAuthentication):
+    path = '/enrollment/'
+    model = models.CourseEnrollmentDaily
+
+    def generate_data(self, course_id, date):
+        G(self.model, course_id=course_id, date=date, count=203)
+
+
+class CourseEnrollmentModeBulkViewTests(BulkCourseEnrollmentViewTestMixin, TestCaseWithAuthentication):
+    path = '/enrollment/mode/'
+    model = models.CourseEnrollmentModeDaily
+
+    def generate_data(self, course_id, date):
+        for mode in enrollment_modes.ALL:
+            G(self.model, course_id=course_id, date=date, mode=mode, count=10)
+
 
 class CourseEnrollmentModeViewTests(CourseEnrollmentViewTestCaseMixin, DefaultFillTestMixin,
                                     TestCaseWithAuthentication):
@@ -466,6 +848,7 @@ class CourseEnrollmentByLocationViewTests(CourseEnrollmentViewTestCaseMixin, Tes
     path = '/enrollment/location/'
     model = models.CourseEnrollmentByCountry
     csv_filename_slug = u'enrollment-location'
+    paginated = False
 
     def format_as_response(self, *args):
         unknown = {'course_id': None, 'count': 0, 'date': None,
@@ -507,6 +890,17 @@ class CourseEnrollmentByLocationViewTests(CourseEnrollmentViewTestCaseMixin, Tes
         self.country = get_country('US')
         self.generate_data()
 
+    def test_get_alternative_codes(self):
+        """ Counts stored under different codes for the same country should be combined. """
+        G(self.model, course_id=self.course_id, country_code='USA', count=5, date=self.date)
+        G(self.model, course_id=self.course_id, country_code='us', count=3, date=self.date)
+
+        response = self.authenticated_get(u'%scourses/%s%s' % (self.api_root_path, self.course_id, self.path))
+        self.assertEquals(response.status_code, 200)
+
+        us_counts = [item['count'] for item in response.data if item['country']['alpha2'] == 'US']
+        self.assertEqual(us_counts, [455 + 5 + 3])
+
 
 class CourseActivityWeeklyViewTests(CourseViewTestCaseMixin, TestCaseWithAuthentication):
     path = '/activity/'
@@ -580,3 +974,74 @@ class CourseActivityWeeklyViewTests(CourseViewTestCaseMixin, TestCaseWithAuthent
         expected = self.format_as_response(*self.model.objects.all())
         self.assertEqual(len(expected), 2)
         self.assertIntervalFilteringWorks(expected, self.interval_start, interval_end + datetime.timedelta(days=1))
+
+
+class CourseProblemsListViewTests(DemoCourseMixin, TestCaseWithAuthentication):
+    def setUp(self):
+        super(CourseProblemsListViewTests, self).setUp()
+        self.path = u'/api/v0/courses/{0}/problems/'.format(self.course_id)
+        self.model = models.ProblemResponseAnswerDistribution
+
+        G(self.model, course_id=self.course_id, module_id='i4x://problem/1', correct=True, count=3)
+        G(self.model, course_id=self.course_id, module_id='i4x://problem/1', correct=False, count=5)
+        G(self.model, course_id=self.course_id, module_id='i4x://problem/1', correct=None, count=2)
+        G(self.model, course_id=self.course_id, module_id='i4x://problem/2', correct=False, count=4)
+        G(self.model, course_id='edX/DemoX/Other_Course', module_id='i4x://problem/3', correct=True, count=1)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_get(self):
+        # Authenticate once so that the token is cached.
+        self.authenticated_get(self.path)
+
+        with self.assertNumQueries(1):
+            response = self.authenticated_get(self.path)
+        self.assertEquals(response.status_code, 200)
+
+        expected = [
+            {'module_id': 'i4x://problem/1', 'total': 10, 'correct': 3, 'percent_correct': 30.0},
+            {'module_id': 'i4x://problem/2', 'total': 4, 'correct': 0, 'percent_correct': 0.0},
+        ]
+        self.assertEquals(response.data, expected)
+
+    def test_get_cached(self):
+        response = self.authenticated_get(self.path)
+        self.model.objects.update(count=F('count') + 1)
+        self.assertEquals(self.authenticated_get(self.path).content, response.content)
+
+        call_command('invalidate_api_cache', self.model._meta.db_table)  # pylint: disable=protected-access
+        self.assertNotEquals(self.authenticated_get(self.path).content, response.content)
+
+    def test_get_not_found(self):
+        response = self.authenticated_get(u'/api/v0/courses/edX/DemoX/Non_Existent_Course/problems/')
+        self.assertEquals(response.status_code, 404)
+
+
+class IterateUnbufferedTests(TestCase):
+    def test_mysql_server_side_cursor(self):
+        """ Verify that, on MySQL, only the query of the queryset is run with a server-side cursor. """
+        connection = mock.Mock(vendor='mysql')
+        connection.connection.cursorclass = 'Cursor'
+        cursor_classes = []
+
+        def iterator():
+            cursor_classes.append(connection.connection.cursorclass)
+            yield 1
+            cursor_classes.append(connection.connection.cursorclass)
+            yield 2
+
+        queryset = mock.Mock(db='default')
+        queryset.using.return_value.iterator.return_value = iterator()
+        mysqldb = {'MySQLdb': mock.Mock(), 'MySQLdb.cursors': mock.Mock(SSCursor='SSCursor')}
+
+        with mock.patch.dict('sys.modules', mysqldb):
+            with mock.patch('analytics_data_api.v0.views.connections', {'default': connection}):
+                self.assertEquals(list(iterate_unbuffered(queryset)), [1, 2])
+
+        queryset.using.assert_called_once_with('default')
+        self.assertEquals(cursor_classes, ['SSCursor', 'Cursor'])
+        self.assertEquals(connection.connection.cursorclass, 'Cursor')
+
+    def test_other_databases(self):
+        G(models.CourseEnrollmentDaily, course_id=DEMO_COURSE_ID, date=datetime.date(2014, 1, 1), count=1)
+        queryset = models.CourseEnrollmentDaily.objects.all()
+        self.assertEquals(list(iterate_unbuffered(queryset)), list(queryset))
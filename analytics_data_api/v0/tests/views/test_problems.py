@@ -5,9 +5,13 @@
 
 # pylint: disable=no-member,no-value-for-parameter
 
+import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django_dynamic_fixture import G
 
-from analytics_data_api.v0 import models
+from analytics_data_api.v0 import models, sharding
 from analytics_data_api.v0.serializers import ProblemResponseAnswerDistributionSerializer, \
     GradeDistributionSerializer, SequentialOpenDistributionSerializer
 from analytics_data_api.v0.tests.views import DemoCourseMixin
@@ -43,6 +47,99 @@ class AnswerDistributionTests(TestCaseWithAuthentication):
         response = self.authenticated_get('/api/v0/problems/%s%s' % ("DOES-NOT-EXIST", self.path))
         self.assertEquals(response.status_code, 404)
 
+    def test_get_conditional(self):
+        path = '/api/v0/problems/%s%s' % (self.module_id, self.path)
+        response = self.authenticated_get(path)
+        self.assertEquals(response.status_code, 200)
+
+        response = self.authenticated_get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEquals(response.status_code, 304)
+
+        response = self.authenticated_get(path, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEquals(response.status_code, 200)
+
+    def test_get_fields(self):
+        path = '/api/v0/problems/%s%s' % (self.module_id, self.path)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.authenticated_get(path, {'fields': 'count,part_id'})
+        self.assertEquals(response.status_code, 200)
+        self.assertListEqual(response.data, [{'part_id': self.part_id1, 'count': self.ad1.count}])
+
+        # Columns of fields that were not requested should not be retrieved.
+        sql = context.captured_queries[-1]['sql']
+        self.assertIn('count', sql)
+        self.assertNotIn('question_text', sql)
+
+    def test_get_csv(self):
+        path = '/api/v0/problems/%s%s' % (self.module_id, self.path)
+        response = self.authenticated_get(path, {'fields': 'part_id,count'}, HTTP_ACCEPT='text/csv')
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEquals(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEquals(''.join(response.streaming_content),
+                          'count,part_id\r\n{0},{1}\r\n'.format(self.ad1.count, self.part_id1))
+
+        response = self.authenticated_get('/api/v0/problems/%s%s' % ("DOES-NOT-EXIST", self.path),
+                                          HTTP_ACCEPT='text/csv')
+        self.assertEquals(response.status_code, 404)
+
+    def test_get_paginated(self):
+        for part_id in ('b', 'a', 'b'):
+            G(models.ProblemResponseAnswerDistribution, course_id=self.course_id, module_id=self.module_id,
+              part_id=part_id)
+
+        path = '/api/v0/problems/%s%s' % (self.module_id, self.path)
+        expected = self.authenticated_get(path).data
+        expected = sorted(expected, key=lambda answer: answer['part_id'])
+
+        response = self.authenticated_get(path, {'page_size': 3})
+        self.assertEquals(response.status_code, 200)
+        self.assertListEqual(response.data, expected[:3])
+
+        next_url = response['Link'][1:-len('>; rel="next"')]
+        with self.assertNumQueries(1):
+            response = self.authenticated_get(next_url)
+        self.assertEquals(response.status_code, 200)
+        self.assertListEqual(response.data, expected[3:])
+        self.assertFalse(response.has_header('Link'))
+
+    def test_get_invalid_fields(self):
+        path = '/api/v0/problems/%s%s' % (self.module_id, self.path)
+        response = self.authenticated_get(path, {'fields': 'count,password'})
+        self.assertEquals(response.status_code, 400)
+
+    def test_get_hoisted(self):
+        part_id2 = "i4x-org-num-run-problem-RANDOMNUMBER_3_1"
+        ad2 = G(models.ProblemResponseAnswerDistribution, course_id=self.course_id, module_id=self.module_id,
+                part_id=part_id2)
+        ad3 = G(models.ProblemResponseAnswerDistribution, course_id=self.course_id, module_id=self.module_id,
+                part_id=part_id2, problem_display_name=ad2.problem_display_name, question_text=ad2.question_text)
+
+        response = self.authenticated_get('/api/v0/problems/%s%s' % (self.module_id, self.path), {'hoist': 'true'})
+        self.assertEquals(response.status_code, 200)
+
+        def format_as_answer(answer):
+            answer = dict(ProblemResponseAnswerDistributionSerializer(answer).data)
+            for name in ('course_id', 'module_id', 'part_id', 'problem_display_name', 'question_text'):
+                del answer[name]
+            return answer
+
+        def format_as_part(answer, *answers):
+            return {
+                'part_id': answer.part_id,
+                'problem_display_name': answer.problem_display_name,
+                'question_text': answer.question_text,
+                'answers': [format_as_answer(answer) for answer in answers],
+            }
+
+        expected = {
+            'course_id': self.course_id,
+            'module_id': self.module_id,
+            'parts': [format_as_part(self.ad1, self.ad1), format_as_part(ad2, ad2, ad3)],
+        }
+        self.assertDictEqual(response.data, expected)
+
 
 class GradeDistributionTests(TestCaseWithAuthentication):
     path = '/grade_distribution/'
@@ -163,3 +260,108 @@ class SubmissionCountsListViewTests(DemoCourseMixin, TestCaseWithAuthentication)
         """
         response = self._get_data()
         self.assertEquals(response.status_code, 406)
+
+    def test_get_sums(self):
+        """
+        The view should return the total and correct number of submissions across all answers to a problem.
+        """
+        module_id = 'i4x://org/num/run/problem/SUMS'
+        G(models.ProblemResponseAnswerDistribution, module_id=module_id, correct=True, count=3)
+        G(models.ProblemResponseAnswerDistribution, module_id=module_id, correct=True, count=4)
+        G(models.ProblemResponseAnswerDistribution, module_id=module_id, correct=False, count=5)
+        G(models.ProblemResponseAnswerDistribution, module_id=module_id, correct=None, count=6)
+
+        # Authenticate once so that the token is cached.
+        self._get_data([module_id])
+
+        with self.assertNumQueries(1):
+            response = self._get_data([module_id])
+        self.assertEquals(response.status_code, 200)
+        self.assertListEqual(response.data, [{'module_id': module_id, 'total': 18, 'correct': 7}])
+
+    def test_get_sharded(self):
+        """
+        The view should add up the counts of a problem held by several databases, and return the problems in order.
+        """
+        module_id = 'i4x://org/num/run/problem/SHARDED'
+        G(models.ProblemResponseAnswerDistribution, module_id=module_id, correct=True, count=3)
+        G(models.ProblemResponseAnswerDistribution, module_id=module_id, correct=False, count=5)
+        problem_ids = sorted([module_id, self.ad_1.module_id])
+
+        # Authenticate once so that the token is cached.
+        self._get_data(problem_ids)
+
+        # Both shards are the test database, so every answer is retrieved twice.
+        shard_map = sharding.HashShardMap(['default', 'default'])
+        with mock.patch('analytics_data_api.v0.sharding.get_shard_map', return_value=shard_map):
+            with self.assertNumQueries(2):
+                response = self._get_data(problem_ids)
+
+        self.assertEquals(response.status_code, 200)
+        expected = {
+            module_id: {'module_id': module_id, 'total': 16, 'correct': 6},
+            self.ad_1.module_id: {'module_id': self.ad_1.module_id, 'total': self.ad_1.count * 2,
+                                  'correct': self.ad_1.count * 2 if self.ad_1.correct else 0},
+        }
+        self.assertListEqual(response.data, [expected[problem_id] for problem_id in problem_ids])
+
+
+class BatchModuleViewTestMixin(object):
+    """ Verify the batch endpoints return the same data as the endpoints of individual modules. """
+    model = None
+    path = None
+    ids_param = None
+
+    def setUp(self):
+        super(BatchModuleViewTestMixin, self).setUp()
+        self.module_ids = ['i4x://org/class/test/problem/BATCH_1', 'i4x://org/class/test/problem/BATCH_2']
+
+        for module_id in self.module_ids:
+            G(self.model, course_id='org/class/test', module_id=module_id)
+            G(self.model, course_id='org/class/test', module_id=module_id)
+
+    def test_get(self):
+        path = '/api/v0/problems%s' % self.path
+        module_ids = ','.join(self.module_ids + ['DOES-NOT-EXIST'])
+
+        # Authenticate once so that the token is cached.
+        self.authenticated_get(path, {self.ids_param: module_ids})
+
+        with self.assertNumQueries(1):
+            response = self.authenticated_get(path, {self.ids_param: module_ids})
+        self.assertEquals(response.status_code, 200)
+
+        expected = {}
+        for module_id in self.module_ids:
+            expected[module_id] = self.authenticated_get('/api/v0/problems/%s%s' % (module_id, self.path)).data
+        self.assertDictEqual(response.data, expected)
+
+    def test_get_fields(self):
+        response = self.authenticated_get('/api/v0/problems%s' % self.path,
+                                          {self.ids_param: self.module_ids[0], 'fields': 'count'})
+        self.assertEquals(response.status_code, 200)
+
+        # The module ID is returned, since the results are grouped by it.
+        expected = [{'module_id': self.module_ids[0], 'count': item.count}
+                    for item in self.model.objects.filter(module_id=self.module_ids[0]).order_by('id')]
+        self.assertDictEqual(response.data, {self.module_ids[0]: expected})
+
+    def test_get_404(self):
+        response = self.authenticated_get('/api/v0/problems%s' % self.path, {self.ids_param: 'DOES-NOT-EXIST'})
+        self.assertEquals(response.status_code, 404)
+
+    def test_get_406(self):
+        response = self.authenticated_get('/api/v0/problems%s' % self.path)
+        self.assertEquals(response.status_code, 406)
+
+
+class GradeDistributionBatchTests(BatchModuleViewTestMixin, TestCaseWithAuthentication):
+    model = models.GradeDistribution
+    path = '/grade_distribution/'
+    ids_param = 'problem_ids'
+
+
+class SequentialOpenDistributionBatchTests(BatchModuleViewTestMixin, TestCaseWithAuthentication):
+    model = models.SequentialOpenDistribution
+    path = '/sequential_open_distribution/'
+    ids_param = 'module_ids'
@@ -0,0 +1,183 @@
+# coding=utf-8
+# NOTE: Full URLs are used throughout these tests to ensure that the API contract is fulfilled. The URLs should *not*
+# change for versions greater than 1.0.0. Tests target a specific version of the API, additional tests should be added
+# for subsequent versions if there are breaking changes introduced in those versions.
+
+import datetime
+import StringIO
+
+from django.core.management import call_command
+from django.core.urlresolvers import get_resolver, RegexURLResolver, reverse
+from django.db import connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from django_dynamic_fixture import G
+import pytz
+
+from analytics_data_api.constants import enrollment_modes, genders, granularities
+from analytics_data_api.v0 import models
+from analytics_data_api.v0.tests.views import DemoCourseMixin
+from analytics_data_api.v0.views.courses import BaseCourseEnrollmentView, BulkCourseViewMixin
+from analytics_data_api.v0.views.problems import BatchModuleViewMixin, SubmissionCountsListView
+from analyticsdataserver.tests import TestCaseWithAuthentication
+
+# The number of SQL queries each endpoint may run to serve a request, by URL name. Requests are made after the client
+# has authenticated, and without cached responses, so these are the queries that retrieve the data. Lower a budget
+# when an endpoint is optimized, so that it does not regress.
+QUERY_BUDGETS = {
+    'activity': 1,
+    'recent_activity': 1,
+    'enrollment_latest': 1,
+    'enrollment_by_mode': 1,
+    'enrollment_by_birth_year': 1,
+    'enrollment_by_education': 1,
+    'enrollment_by_gender': 1,
+    'enrollment_by_location': 1,
+    'problems': 1,
+    # The latest dates of the courses are looked up before their data is retrieved.
+    'enrollment_bulk': 2,
+    'enrollment_by_mode_bulk': 2,
+    'answer_distribution': 1,
+    'grade_distribution': 1,
+    'grade_distribution_batch': 1,
+    'sequential_open_distribution': 1,
+    'sequential_open_distribution_batch': 1,
+    'submission_counts': 1,
+}
+
+# Requests for weekly or monthly enrollment look up the last date of each period before retrieving the data.
+PERIOD_QUERIES = 1
+
+DATE_FILTERS = {'start_date': '2014-01-01', 'end_date': '2014-02-01'}
+ACCEPT_HEADERS = ('application/json', 'text/csv')
+
+
+def get_endpoints():
+    """
+    Returns the namespaced view name, view class and URL pattern of every endpoint of the API, by URL name, as resolved
+    from the URL configuration. The redirects at the root of the API are not endpoints of their own, and are omitted.
+    """
+    endpoints = {}
+    v0_resolver = get_resolver(None).namespace_dict['api'][1].namespace_dict['v0'][1]
+
+    for resolver in v0_resolver.url_patterns:
+        if not isinstance(resolver, RegexURLResolver):
+            continue
+
+        for pattern in resolver.url_patterns:
+            # Patterns with a format suffix (e.g. .json) are copies of the patterns without one.
+            if 'format' not in pattern.regex.groupindex:
+                endpoints[pattern.name] = (u'{0}:{1}'.format(resolver.namespace, pattern.name), pattern.callback.cls,
+                                           pattern)
+
+    return endpoints
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class QueryCountTests(DemoCourseMixin, TestCaseWithAuthentication):
+    """ Verify that requests to every endpoint run no more SQL queries than budgeted. """
+
+    module_id = 'i4x://edX/DemoX/problem/QUERY_COUNTS'
+
+    @classmethod
+    def setUpClass(cls):
+        super(QueryCountTests, cls).setUpClass()
+        date = datetime.date(2014, 1, 15)
+        interval_end = datetime.datetime(2014, 1, 20, tzinfo=pytz.utc)
+
+        G(models.CourseEnrollmentDaily, course_id=cls.course_id, date=date, count=10)
+        G(models.CourseEnrollmentByBirthYear, course_id=cls.course_id, date=date, birth_year=1990, count=10)
+        G(models.CourseEnrollmentByEducation, course_id=cls.course_id, date=date, education_level='bachelors',
+          count=10)
+        G(models.CourseEnrollmentByCountry, course_id=cls.course_id, date=date, country_code='US', count=10)
+
+        for mode in enrollment_modes.ALL:
+            G(models.CourseEnrollmentModeDaily, course_id=cls.course_id, date=date, mode=mode, count=10)
+
+        for gender in genders.ALL:
+            G(models.CourseEnrollmentByGender, course_id=cls.course_id, date=date, gender=gender, count=10)
+
+        for activity_type in ('ACTIVE', 'ATTEMPTED_PROBLEM', 'PLAYED_VIDEO', 'POSTED_FORUM'):
+            G(models.CourseActivityWeekly, course_id=cls.course_id, activity_type=activity_type, count=10,
+              interval_start=interval_end - datetime.timedelta(days=7), interval_end=interval_end)
+
+        for part in range(2):
+            G(models.ProblemResponseAnswerDistribution, course_id=cls.course_id, module_id=cls.module_id,
+              part_id=u'{0}_{1}'.format(cls.module_id, part), count=10)
+            G(models.GradeDistribution, course_id=cls.course_id, module_id=cls.module_id, grade=part, count=10)
+            G(models.SequentialOpenDistribution, course_id=cls.course_id, module_id=cls.module_id, count=10)
+
+        # The data pipeline records the latest date of each course after each load.
+        call_command('update_latest_dates', stdout=StringIO.StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        for model in (models.CourseLatestDate, models.CourseEnrollmentDaily, models.CourseEnrollmentByBirthYear,
+                      models.CourseEnrollmentByEducation, models.CourseEnrollmentByCountry,
+                      models.CourseEnrollmentModeDaily, models.CourseEnrollmentByGender, models.CourseActivityWeekly,
+                      models.ProblemResponseAnswerDistribution, models.GradeDistribution,
+                      models.SequentialOpenDistribution):
+            model.objects.all().delete()
+        super(QueryCountTests, cls).tearDownClass()
+
+    def get_requests(self):
+        """ Returns the name, path and query parameters of a request to each endpoint, with and without dates. """
+        requests = []
+
+        for name, (view_name, view, pattern) in sorted(get_endpoints().items()):
+            kwargs = dict((group, self.course_id if group == 'course_id' else self.module_id)
+                          for group in pattern.regex.groupindex)
+            path = reverse('api:v0:' + view_name, kwargs=kwargs)
+            data = {}
+
+            if issubclass(view, BulkCourseViewMixin):
+                data['course_ids'] = self.course_id
+            elif issubclass(view, BatchModuleViewMixin):
+                data[view.ids_param] = self.module_id
+            elif issubclass(view, SubmissionCountsListView):
+                data['problem_ids'] = self.module_id
+
+            requests.append((name, path, data, 0))
+            requests.append((name, path, dict(data, **DATE_FILTERS), 0))
+
+            if issubclass(view, BaseCourseEnrollmentView):
+                for granularity in (granularities.WEEK, granularities.MONTH):
+                    requests.append((name, path, dict(data, granularity=granularity, **DATE_FILTERS), PERIOD_QUERIES))
+
+        return requests
+
+    def assertWithinBudget(self, name, path, data, accept, extra_queries):
+        # Authenticate once so that the token is cached.
+        self.authenticated_get(path, data, HTTP_ACCEPT=accept)
+
+        # Queries are captured on every database, since the data may be retrieved from replicas or shards.
+        captures = [CaptureQueriesContext(connections[alias]) for alias in connections]
+        for capture in captures:
+            capture.__enter__()
+
+        try:
+            response = self.authenticated_get(path, data, HTTP_ACCEPT=accept)
+
+            # Streamed responses run their queries as they are streamed.
+            if response.streaming:
+                ''.join(response.streaming_content)
+        finally:
+            for capture in reversed(captures):
+                capture.__exit__(None, None, None)
+
+        queries = [query for capture in captures for query in capture.captured_queries]
+        budget = QUERY_BUDGETS[name] + extra_queries
+
+        self.assertEquals(response.status_code, 200, u'{0} {1} returned {2}'.format(path, data, response.status_code))
+        self.assertLessEqual(
+            len(queries), budget,
+            u'{0} {1} ({2}) ran {3} queries, but its budget is {4}:\n{5}'.format(
+                path, data, accept, len(queries), budget, u'\n'.join(query['sql'] for query in queries)))
+
+    def test_budgets(self):
+        """ Every endpoint should declare a budget. """
+        self.assertSetEqual(set(QUERY_BUDGETS), set(get_endpoints()))
+
+    def test_query_counts(self):
+        for name, path, data, extra_queries in self.get_requests():
+            for accept in ACCEPT_HEADERS:
+                self.assertWithinBudget(name, path, data, accept, extra_queries)
@@ -12,10 +12,21 @@ COURSE_URLS = [
     ('enrollment/education', views.CourseEnrollmentByEducationView, 'enrollment_by_education'),
     ('enrollment/gender', views.CourseEnrollmentByGenderView, 'enrollment_by_gender'),
     ('enrollment/location', views.CourseEnrollmentByLocationView, 'enrollment_by_location'),
+    ('problems', views.CourseProblemsListView, 'problems'),
+]
+
+# Endpoints returning the data of several courses
+BULK_COURSE_URLS = [
+    ('enrollment', views.CourseEnrollmentBulkView, 'enrollment_bulk'),
+    ('enrollment/mode', views.CourseEnrollmentModeBulkView, 'enrollment_by_mode_bulk'),
 ]
 
 urlpatterns = []
 
+for path, view, name in BULK_COURSE_URLS:
+    regex = r'^{0}/$'.format(path)
+    urlpatterns += patterns('', url(regex, view.as_view(), name=name))
+
 for path, view, name in COURSE_URLS:
     regex = r'^{0}/{1}/$'.format(COURSE_ID_PATTERN, path)
     urlpatterns += patterns('', url(regex, view.as_view(), name=name))
@@ -12,6 +12,9 @@ PROBLEM_URLS = [
 urlpatterns = patterns(
     '',
     url(r'^submission_counts/$', views.SubmissionCountsListView.as_view(), name='submission_counts'),
+    url(r'^grade_distribution/$', views.GradeDistributionBatchView.as_view(), name='grade_distribution_batch'),
+    url(r'^sequential_open_distribution/$', views.SequentialOpenDistributionBatchView.as_view(),
+        name='sequential_open_distribution_batch'),
     url(r'^(?P<module_id>.+)/sequential_open_distribution/$',
         views.SequentialOpenDistributionView.as_view(), name='sequential_open_distribution'),
 )
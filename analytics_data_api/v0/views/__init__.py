@@ -0,0 +1,494 @@
+import base64
+import datetime
+import heapq
+from itertools import chain, count
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.db.models.query import QuerySet, ValuesQuerySet
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.datastructures import SortedDict
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.templatetags.rest_framework import replace_query_param
+
+from analytics_data_api.renderers import StreamingRendererMixin
+from analytics_data_api.v0 import caching, sharding
+from analyticsdataserver.router import read_from_primary
+
+
+def get_ordering(queryset):
+    """ Returns the names of the fields by which the rows of the queryset are ordered, defaulting to the model's. """
+    return queryset.query.order_by or queryset.model._meta.ordering  # pylint: disable=protected-access
+
+
+def iterate_unbuffered(queryset):
+    """
+    Returns an iterator over the rows of the queryset, without caching them or retrieving them all at once.
+
+    MySQLdb's default cursor retrieves the entire result set when the query is executed, so on MySQL the query is run
+    with a server-side cursor instead, from which the rows are fetched in chunks as they are iterated. No other query
+    can be run on the same connection until every row has been retrieved.
+    """
+    database = queryset.db
+    connection = connections[database]
+    rows = queryset.using(database).iterator()
+
+    if connection.vendor == 'mysql':
+        from MySQLdb.cursors import SSCursor  # pylint: disable=import-error
+
+        connection.ensure_connection()
+        cursor_class = connection.connection.cursorclass
+        connection.connection.cursorclass = SSCursor
+
+        # The query is executed when the first row is requested. Only its cursor is a server-side cursor.
+        try:
+            rows = chain([next(rows)], rows)
+        except StopIteration:
+            return
+        finally:
+            connection.connection.cursorclass = cursor_class
+
+    for row in rows:
+        yield row
+
+
+def merge_querysets(querysets):
+    """
+    Returns an iterator over the rows of the given querysets (e.g. copies of a queryset run against several databases),
+    without caching them or retrieving them all at once.
+
+    The querysets must have the same ascending ordering, by which the rows are merged. The ordering defaults to the
+    model's ordering.
+    """
+    if len(querysets) == 1:
+        return iterate_unbuffered(querysets[0])
+
+    ordering = get_ordering(querysets[0])
+
+    def get_key(row):
+        return [row[name] if isinstance(row, dict) else getattr(row, name) for name in ordering]
+
+    # The counter breaks ties, so that rows themselves are never compared.
+    counter = count()
+    decorated = [((get_key(row), next(counter), row) for row in iterate_unbuffered(queryset)) for queryset in querysets]
+    return (row for _key, _index, row in heapq.merge(*decorated))
+
+
+def scatter_gather(queryset):
+    """
+    Returns the rows of the queryset from every database that may hold some of them, merged in the queryset's order.
+
+    If the data is not sharded, the queryset itself is returned, so that it is only evaluated if needed.
+    """
+    querysets = sharding.scatter(queryset)
+
+    if len(querysets) == 1:
+        return querysets[0]
+
+    return list(merge_querysets(querysets))
+
+
+class DataVersionMixin(object):
+    """
+    Identifies responses by the request and the data version of the table backing the view.
+
+    Replicas may be up to ANALYTICS_REPLICA_MAX_LAG seconds behind. For that long after the data version is bumped,
+    data is read from ANALYTICS_DATABASE, so that stale rows are never cached, or validated, as the new version.
+    """
+
+    model = None
+    _data_version = None
+
+    def get_data_version(self):
+        if self._data_version is None:
+            self._data_version = caching.get_data_version(self.model._meta.db_table)  # pylint: disable=protected-access
+        return self._data_version
+
+    def initial(self, request, *args, **kwargs):
+        super(DataVersionMixin, self).initial(request, *args, **kwargs)
+
+        if settings.ANALYTICS_DATABASE_REPLICAS and \
+                caching.get_data_version_age(self.get_data_version()) < settings.ANALYTICS_REPLICA_MAX_LAG:
+            read_from_primary()
+
+    def get_response_key_parts(self, request):
+        """ Returns the values that, together, identify the content of a response. """
+        parts = [self.__class__.__name__, request.accepted_media_type, self.get_data_version()]
+        parts += sorted(self.kwargs.items())
+        parts += sorted(request.QUERY_PARAMS.lists())
+        return parts
+
+
+class CachedResponseMixin(DataVersionMixin):
+    """
+    Caches rendered responses until the data in the view's table changes.
+
+    Bumping the data version (e.g. with the invalidate_api_cache management command after a pipeline run) invalidates
+    every cached response for the table.
+    """
+
+    # Headers that are cached, and returned, with the content of responses
+    cached_headers = ('Content-Type', 'Link')
+
+    def get(self, request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+
+        if not timeout:
+            return super(CachedResponseMixin, self).get(request, *args, **kwargs)
+
+        key = caching.make_cache_key('response', *self.get_response_key_parts(request))
+        cached = cache.get(key)
+
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content)
+
+            for header, value in headers:
+                response[header] = value
+
+            return response
+
+        response = super(CachedResponseMixin, self).get(request, *args, **kwargs)
+
+        if isinstance(response, Response) and response.status_code == 200:
+            # The response is rendered after the view returns, so it can only be cached once rendering is complete.
+            def cache_rendered_response(rendered):
+                headers = [(header, rendered[header]) for header in self.cached_headers if rendered.has_header(header)]
+                cache.set(key, (rendered.content, headers), timeout)
+
+            response.add_post_render_callback(cache_rendered_response)
+
+        return response
+
+
+class ConditionalResponseMixin(DataVersionMixin):
+    """
+    Answers conditional GET requests without querying or serializing the data.
+
+    The ETag is derived from the same values used to cache the response, and Last-Modified from the time at which the
+    data version was last bumped. Both change whenever the data in the view's table changes, and are the same in every
+    process, since data versions are stored in the shared cache.
+    """
+
+    def get_etag(self, request):
+        return caching.make_digest(*self.get_response_key_parts(request))
+
+    def get_last_modified(self):
+        # Data versions are timestamps, in milliseconds, of the last time the table was modified. Each bump advances the
+        # version to a later second, so truncating it to seconds still changes Last-Modified with every bump.
+        return self.get_data_version() // 1000
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+
+        # If-None-Match takes precedence over If-Modified-Since.
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return etag in etags or '*' in etags
+
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE'))
+        return if_modified_since is not None and last_modified <= if_modified_since
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        last_modified = self.get_last_modified()
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            response = super(ConditionalResponseMixin, self).get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = quote_etag(etag)
+            response['Last-Modified'] = http_date(last_modified)
+
+        return response
+
+
+class FieldProjectionMixin(object):
+    """
+    Limits the fields returned to those listed in the fields query parameter (e.g. ?fields=module_id,count).
+
+    Fields that are not requested are not serialized and, where the view returns model instances, their columns are not
+    retrieved from the database.
+    """
+
+    _requested_fields = None
+
+    def get_requested_fields(self):
+        """
+        Returns the names of the requested fields, in the order in which they are serialized, or None if all fields
+        should be returned.
+        """
+        if self._requested_fields is None:
+            requested = set(self.request.QUERY_PARAMS.get('fields', '').split(',')) - {''}
+            available = self.get_serializer_class()().get_fields()
+
+            unknown = requested - set(available)
+            if unknown:
+                raise ParseError(u'Unknown fields: {0}'.format(u', '.join(sorted(unknown))))
+
+            self._requested_fields = [name for name in available if name in requested]
+
+        return self._requested_fields or None
+
+    def project_queryset(self, queryset):
+        """ Defers loading the columns of the fields that were not requested. """
+        fields = self.get_requested_fields()
+
+        if fields is None or not isinstance(queryset, QuerySet) or isinstance(queryset, ValuesQuerySet):
+            return queryset
+
+        # pylint: disable=protected-access
+        column_fields = set(field.name for field in queryset.model._meta.concrete_fields)
+        serializer_fields = self.get_serializer_class()().get_fields()
+        sources = [serializer_fields[name].source or name for name in fields]
+
+        # Fields computed from other columns (e.g. the country of an enrollment) may need any column. Deferring those
+        # would result in an additional query per row.
+        if not column_fields.issuperset(sources):
+            return queryset
+
+        required = self.get_required_fields()
+
+        # Rows retrieved from several databases are merged by their ordering fields, which would otherwise be loaded
+        # with an additional query per row.
+        if len(sharding.get_databases()) > 1:
+            required += [name.lstrip('-') for name in get_ordering(queryset)]
+
+        return queryset.only(*(sources + required))
+
+    def get_required_fields(self):
+        """ Returns the names of the model fields that must be retrieved even if they were not requested. """
+        return []
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super(FieldProjectionMixin, self).get_serializer(*args, **kwargs)
+        fields = self.get_requested_fields()
+
+        if fields is not None:
+            for name in serializer.fields.keys():
+                if name not in fields:
+                    del serializer.fields[name]
+
+        return serializer
+
+
+class GroupedResponseMixin(object):
+    """
+    Returns the results grouped by the value of a field (e.g. {course_id: [result, ...], ...}) instead of as a list.
+
+    CSV and streamed responses are not grouped, since every row includes the field. The field is always returned,
+    even if other fields are requested.
+    """
+
+    group_by = None
+
+    def list(self, request, *args, **kwargs):
+        response = super(GroupedResponseMixin, self).list(request, *args, **kwargs)
+
+        if not response.streaming and request.accepted_renderer.format != 'csv':
+            data = SortedDict()
+            for item in response.data:
+                data.setdefault(item[self.group_by], []).append(item)
+            response.data = data
+
+        return response
+
+    def get_requested_fields(self):
+        fields = super(GroupedResponseMixin, self).get_requested_fields()
+
+        if fields is not None and self.group_by not in fields:
+            fields = [self.group_by] + fields
+
+        return fields
+
+
+class KeysetPaginationMixin(object):
+    """
+    Returns the results in pages if the page_size query parameter is specified. The URL of the next page, if there is
+    one, is returned in a Link header (e.g. Link: <...?page_size=100&cursor=...>; rel="next").
+
+    The cursor identifies the last row of the previous page by the values of its cursor fields. The next page is
+    retrieved by filtering on those values, which can use an index, instead of skipping the previous rows with OFFSET.
+    The cursor fields must uniquely identify a row and default to the model's ordering. They may be NULL, which the
+    databases supported (MySQL and SQLite) order before every other value.
+    """
+
+    cursor_fields = None
+    _page_size = None
+    _next_cursor = None
+
+    def get_cursor_fields(self):
+        """ Returns the fields by which results are ordered and paginated. Pagination is not supported if empty. """
+        if self.cursor_fields is None:
+            return self.model._meta.ordering  # pylint: disable=protected-access
+        return self.cursor_fields
+
+    def get_page_size(self):
+        """ Returns the requested number of results per page, or None if the results should not be paginated. """
+        if self._page_size is None:
+            page_size = self.request.QUERY_PARAMS.get('page_size')
+
+            if page_size is None or not self.get_cursor_fields():
+                self._page_size = 0
+            else:
+                try:
+                    self._page_size = int(page_size)
+                except ValueError:
+                    self._page_size = -1
+
+                if self._page_size < 1:
+                    raise ParseError(u'page_size must be a positive integer.')
+
+        return self._page_size or None
+
+    def get_cursor(self):
+        return self.request.QUERY_PARAMS.get('cursor') if self.get_page_size() else None
+
+    def encode_cursor(self, row):
+        values = []
+
+        for name in self.get_cursor_fields():
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            values.append(value)
+
+        return base64.urlsafe_b64encode(json.dumps(values))
+
+    def decode_cursor(self, cursor):
+        """ Returns the values of the cursor fields encoded in the given cursor. """
+        # pylint: disable=protected-access
+        fields = [self.model._meta.get_field(name) for name in self.get_cursor_fields()]
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise ParseError(u'Invalid cursor.')
+
+    def seek_page(self, queryset):
+        """ Limits the queryset to the requested page, and the first row of the next page. """
+        page_size = self.get_page_size()
+
+        if not page_size:
+            return queryset
+
+        fields = self.get_cursor_fields()
+        cursor = self.get_cursor()
+
+        if cursor:
+            # Select the rows after the cursor: (a > x) OR (a = x AND b > y) OR ... NULLs are ordered first, and cannot
+            # be compared, so every non-NULL value is after NULL, and NULL only equals NULL.
+            values = self.decode_cursor(cursor)
+            seek = Q()
+
+            for index, name in enumerate(fields):
+                if values[index] is None:
+                    condition = Q(**{u'{0}__isnull'.format(name): False})
+                else:
+                    condition = Q(**{u'{0}__gt'.format(name): values[index]})
+
+                for previous, value in zip(fields[:index], values[:index]):
+                    if value is None:
+                        condition &= Q(**{u'{0}__isnull'.format(previous): True})
+                    else:
+                        condition &= Q(**{previous: value})
+
+                seek |= condition
+
+            queryset = queryset.filter(seek)
+
+        return queryset.order_by(*fields)[:page_size + 1]
+
+    def trim_page(self, rows):
+        """
+        Returns the rows of the requested page, as a list, and records the cursor for the next page. Rows are returned
+        unchanged if the results are not paginated.
+        """
+        page_size = self.get_page_size()
+
+        if not page_size:
+            return rows
+
+        rows = list(rows)
+
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self._next_cursor = self.encode_cursor(rows[-1])
+
+        return rows
+
+    def get_required_fields(self):
+        fields = super(KeysetPaginationMixin, self).get_required_fields()
+
+        if self.get_page_size():
+            fields += list(self.get_cursor_fields())
+
+        return fields
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(KeysetPaginationMixin, self).finalize_response(request, response, *args, **kwargs)
+
+        if self._next_cursor is not None and response.status_code == 200:
+            url = replace_query_param(request.build_absolute_uri(), 'cursor', self._next_cursor)
+            response['Link'] = u'<{0}>; rel="next"'.format(url)
+
+        return response
+
+
+class StreamingListMixin(object):
+    """
+    Streams responses rendered by streaming renderers (i.e. CSV, and JSON if requested with ?format=json-stream),
+    serializing and rendering rows as they are retrieved from the database instead of building the entire response in
+    memory.
+
+    Rows are only retrieved as they are rendered if get_stream_data returns a queryset, or an iterator over querysets
+    (e.g. from merge_querysets). Querysets are run with a server-side cursor on MySQL, since MySQLdb's default cursor
+    retrieves the entire result set at once. Sharded data gathered with scatter_gather is retrieved in full.
+    """
+
+    def get_stream_data(self):
+        """ Returns an iterable of the objects to serialize. Querysets are iterated without caching their results. """
+        data = self.filter_queryset(self.get_queryset())
+
+        if isinstance(data, QuerySet):
+            data = iterate_unbuffered(data)
+
+        return data
+
+    def handle_empty_data(self):
+        """ Called if there is no data to return. """
+        if not self.allow_empty:
+            raise Http404
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+
+        if not isinstance(renderer, StreamingRendererMixin):
+            return super(StreamingListMixin, self).list(request, *args, **kwargs)
+
+        data = iter(self.get_stream_data())
+
+        # Retrieve the first row before responding, so that errors (e.g. 404s for missing data) can still be returned.
+        try:
+            data = chain([next(data)], data)
+        except StopIteration:
+            self.handle_empty_data()
+
+        serializer = self.get_serializer()
+        rows = (serializer.to_native(item) for item in data)
+        content_type = request.accepted_media_type
+        if renderer.charset:
+            content_type = u'{0}; charset={1}'.format(content_type, renderer.charset)
+
+        return StreamingHttpResponse(renderer.render_stream(rows), content_type=content_type)
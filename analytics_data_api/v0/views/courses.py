@@ -1,20 +1,28 @@
+from collections import defaultdict, OrderedDict
 import datetime
-from itertools import groupby
+import operator
 import warnings
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Max
+from django.db import connections
+from django.db.models import DateTimeField, Max, Q, Sum
 from django.http import Http404
 from django.utils.timezone import make_aware, utc
 from rest_framework import generics
+from rest_framework.exceptions import NotAcceptable, ParseError
 from opaque_keys.edx.keys import CourseKey
-from analytics_data_api.constants import enrollment_modes
+from analytics_data_api.constants import enrollment_modes, genders, granularities
+from analytics_data_api.constants.country import get_country
 
-from analytics_data_api.v0 import models, serializers
+from analytics_data_api.v0 import models, serializers, sharding
+from analytics_data_api.v0.aggregates import ConditionalSum
+from analytics_data_api.v0.views import CachedResponseMixin, ConditionalResponseMixin, FieldProjectionMixin, \
+    GroupedResponseMixin, KeysetPaginationMixin, StreamingListMixin, merge_querysets
 
 
-class BaseCourseView(generics.ListAPIView):
+class BaseCourseView(ConditionalResponseMixin, CachedResponseMixin, KeysetPaginationMixin, FieldProjectionMixin,
+                     StreamingListMixin, generics.ListAPIView):
     start_date = None
     end_date = None
     course_id = None
@@ -39,8 +47,12 @@ class BaseCourseView(generics.ListAPIView):
 
         return super(BaseCourseView, self).get(request, *args, **kwargs)
 
+    def get_course_model_queryset(self, course_id):
+        """ Returns all the rows of the model, in the database that holds the data of the given course. """
+        return self.model.objects.db_manager(hints={'course_id': course_id}).all()
+
     def verify_course_exists_or_404(self, course_id):
-        if self.model.objects.filter(course_id=course_id).exists():
+        if self.get_course_model_queryset(course_id).filter(course_id=course_id).exists():
             return True
 
         raise Http404
@@ -48,12 +60,97 @@ class BaseCourseView(generics.ListAPIView):
     def apply_date_filtering(self, queryset):
         raise NotImplementedError
 
-    def get_queryset(self):
-        self.verify_course_exists_or_404(self.course_id)
-        queryset = self.model.objects.filter(course_id=self.course_id)
-        queryset = self.apply_date_filtering(queryset)
+    def filter_latest_date(self, queryset, field_name):
+        """
+        Filter the queryset to the rows with the course's latest value of the given date field.
+
+        The latest date is looked up in the CourseLatestDate table, falling back to aggregating over the course's rows
+        if the course has not been recorded there yet. Both are subqueries, so the data is retrieved with a single
+        statement.
+        """
+        # pylint: disable=protected-access
+        quote_name = connections[queryset.db].ops.quote_name
+        opts = self.model._meta
+        latest_opts = models.CourseLatestDate._meta  # pylint: disable=no-member
+        field = opts.get_field(field_name)
+
+        latest_date = u'summary.{0}'.format(quote_name(latest_opts.get_field('latest_date').column))
+        if not isinstance(field, DateTimeField):
+            latest_date = u'DATE({0})'.format(latest_date)
+
+        where = u'{table}.{column} = COALESCE(' \
+                u'(SELECT {latest_date} FROM {latest_table} summary ' \
+                u'WHERE summary.{table_name} = %s AND summary.{latest_course_id} = %s), ' \
+                u'(SELECT MAX(latest.{column}) FROM {table} latest WHERE latest.{course_id_column} = %s))'
+        where = where.format(
+            table=quote_name(opts.db_table),
+            column=quote_name(field.column),
+            course_id_column=quote_name(opts.get_field('course_id').column),
+            latest_date=latest_date,
+            latest_table=quote_name(latest_opts.db_table),
+            table_name=quote_name(latest_opts.get_field('table_name').column),
+            latest_course_id=quote_name(latest_opts.get_field('course_id').column),
+        )
+        return queryset.extra(where=[where], params=[opts.db_table, self.course_id, self.course_id])
+
+    def aggregate_queryset(self, queryset):
+        """
+        Aggregate the rows of the queryset in the database. By default, rows are returned as they are stored.
+
+        Arguments
+            queryset (QuerySet) -- Data for the course, filtered by date.
+        """
         return queryset
 
+    def format_data(self, data):
+        """
+        Format the retrieved rows for serialization. By default, rows are serialized as they are retrieved.
+
+        Arguments
+            data (iterable) -- Data to be formatted. This may be an iterator, so it should only be iterated once.
+        """
+        return data
+
+    def filter_courses(self, queryset):
+        """ Filter the queryset to the requested course. """
+        return queryset.filter(course_id=self.course_id)
+
+    def get_model_querysets(self):
+        """ Returns all the rows of the model, in each database that holds data of the requested courses. """
+        return [self.get_course_model_queryset(self.course_id)]
+
+    def get_course_querysets(self):
+        """ Returns the data for the courses and dates requested, from each database that holds some of it. """
+        querysets = []
+
+        for queryset in self.get_model_querysets():
+            queryset = self.filter_courses(queryset)
+            queryset = self.apply_date_filtering(queryset)
+            queryset = self.aggregate_queryset(queryset)
+            queryset = self.project_queryset(queryset)
+            querysets.append(self.seek_page(queryset))
+
+        return querysets
+
+    def handle_empty_data(self):
+        if self.start_date or self.end_date or self.get_cursor():
+            # The course may exist, but have no data for the requested dates, or after the cursor.
+            self.verify_course_exists_or_404(self.course_id)
+        else:
+            # There is always data for the latest date of courses that exist.
+            raise Http404
+
+    def get_queryset(self):
+        rows = list(merge_querysets(self.get_course_querysets()))
+
+        if not rows:
+            self.handle_empty_data()
+
+        return list(self.format_data(self.trim_page(rows)))
+
+    def get_stream_data(self):
+        return self.format_data(self.trim_page(merge_querysets(self.get_course_querysets())))
+
     def get_csv_filename(self):
         course_key = CourseKey.from_string(self.course_id)
         course_id = u'-'.join([course_key.org, course_key.course, course_key.run])
@@ -110,12 +207,27 @@ class CourseActivityWeeklyView(BaseCourseView):
         start_date -- Date after which all data is returned (inclusive).
 
         end_date -- Date before which all data is returned (exclusive).
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+
+        page_size -- Number of results to return per page. All results are returned by default.
+
+        cursor -- Position of the page to return. The URL of the next page is returned in the Link header.
     """
 
     slug = u'engagement-activity'
     model = models.CourseActivityWeekly
     serializer_class = serializers.CourseActivityWeeklySerializer
 
+    # Maps the activity types stored by the data pipeline to those displayed by the API. The data pipeline stores
+    # "any" as "active"; however, the API should display "any".
+    ACTIVITY_TYPES = {
+        'ACTIVE': u'any',
+        'ATTEMPTED_PROBLEM': u'attempted_problem',
+        'PLAYED_VIDEO': u'played_video',
+        'POSTED_FORUM': u'posted_forum',
+    }
+
     def apply_date_filtering(self, queryset):
         if self.start_date or self.end_date:
             # Filter by start/end date
@@ -126,55 +238,30 @@ class CourseActivityWeeklyView(BaseCourseView):
                 queryset = queryset.filter(interval_end__lt=self.end_date)
         else:
             # No date filter supplied, so only return data for the latest date
-            latest_date = queryset.aggregate(Max('interval_end'))
-            if latest_date:
-                latest_date = latest_date['interval_end__max']
-                queryset = queryset.filter(interval_end=latest_date)
-        return queryset
-
-    def get_queryset(self):
-        queryset = super(CourseActivityWeeklyView, self).get_queryset()
-        queryset = self.format_data(queryset)
+            queryset = self.filter_latest_date(queryset, 'interval_end')
         return queryset
 
-    def _format_activity_type(self, activity_type):
-        activity_type = activity_type.lower()
-
-        # The data pipeline stores "any" as "active"; however, the API should display "any".
-        if activity_type == 'active':
-            activity_type = 'any'
-
-        return activity_type
-
-    def format_data(self, data):
+    def aggregate_queryset(self, queryset):
         """
-        Group the data by date and combine multiple activity rows into a single row/element.
+        Group the data by interval and combine the counts for each activity type into a single row.
 
-        Arguments
-            data (iterable) -- Data to be formatted.
+        Counts for activity types with no data are None.
         """
-        formatted_data = []
-
-        for key, group in groupby(data, lambda x: (x.course_id, x.interval_start, x.interval_end)):
-            # Iterate over groups and create a single item with all activity types
-            item = {
-                u'course_id': key[0],
-                u'interval_start': key[1],
-                u'interval_end': key[2],
-                u'created': None
-            }
+        counts = dict((api_activity_type, ConditionalSum('count', 'activity_type', [activity_type]))
+                      for activity_type, api_activity_type in self.ACTIVITY_TYPES.items())
 
-            for activity in group:
-                activity_type = self._format_activity_type(activity.activity_type)
-                item[activity_type] = activity.count
-                item[u'created'] = max(activity.created, item[u'created']) if item[u'created'] else activity.created
+        queryset = queryset.values('course_id', 'interval_start', 'interval_end')
+        queryset = queryset.annotate(last_created=Max('created'), **counts)
+        return queryset.order_by('interval_end', 'interval_start', 'course_id')
 
-            formatted_data.append(item)
-
-        return formatted_data
+    def format_data(self, data):
+        # Annotations cannot share the name of a model field, so the creation date is renamed after it is retrieved.
+        for item in data:
+            item[u'created'] = item.pop('last_created')
+            yield item
 
 
-class CourseActivityMostRecentWeekView(generics.RetrieveAPIView):
+class CourseActivityMostRecentWeekView(ConditionalResponseMixin, CachedResponseMixin, generics.RetrieveAPIView):
     """
     Get counts of users who performed specific activities at least once during the most recently computed week.
 
@@ -215,6 +302,7 @@ class CourseActivityMostRecentWeekView(generics.RetrieveAPIView):
 
     """
 
+    model = models.CourseActivityWeekly
     serializer_class = serializers.CourseActivityByWeekSerializer
     DEFAULT_ACTIVITY_TYPE = 'ACTIVE'
 
@@ -257,7 +345,55 @@ class CourseActivityMostRecentWeekView(generics.RetrieveAPIView):
 
 
 class BaseCourseEnrollmentView(BaseCourseView):
+    # Functions returning the first day of the period that contains a date. Weeks start on Monday.
+    PERIOD_STARTS = {
+        granularities.WEEK: lambda date: date - datetime.timedelta(days=date.weekday()),
+        granularities.MONTH: lambda date: date.replace(day=1),
+    }
+
+    def get_granularity(self):
+        granularity = self.request.QUERY_PARAMS.get('granularity', granularities.DAY)
+
+        if granularity not in granularities.ALL:
+            raise ParseError(u'granularity must be one of: {0}'.format(u', '.join(granularities.ALL)))
+
+        return granularity
+
+    def filter_period_last_dates(self, queryset, granularity):
+        """
+        Filter the queryset to the last date with data in each period (e.g. week or month) of each course.
+
+        Enrollment counts are totals as of a date, so the counts of the last date of a period are those of the period.
+        Only the dates of the rows are retrieved to find the last dates; the rows of other dates are not retrieved.
+        """
+        period_start = self.PERIOD_STARTS[granularity]
+        last_dates = {}
+
+        for course_id, date in queryset.order_by().values_list('course_id', 'date').distinct():
+            key = (course_id, period_start(date))
+            last_dates[key] = max(date, last_dates.get(key, date))
+
+        if not last_dates:
+            return queryset.none()
+
+        # Courses usually have data for the same dates, so those are filtered with a single condition.
+        course_dates = defaultdict(set)
+        for (course_id, _period), date in last_dates.items():
+            course_dates[course_id].add(date)
+
+        courses_by_dates = defaultdict(list)
+        for course_id, dates in course_dates.items():
+            courses_by_dates[frozenset(dates)].append(course_id)
+
+        condition = Q()
+        for dates, course_ids in sorted(courses_by_dates.items(), key=lambda item: sorted(item[1])):
+            condition |= Q(course_id__in=sorted(course_ids), date__in=sorted(dates))
+
+        return queryset.filter(condition)
+
     def apply_date_filtering(self, queryset):
+        granularity = self.get_granularity()
+
         if self.start_date or self.end_date:
             # Filter by start/end date
             if self.start_date:
@@ -265,12 +401,12 @@ class BaseCourseEnrollmentView(BaseCourseView):
 
             if self.end_date:
                 queryset = queryset.filter(date__lt=self.end_date)
+
+            if granularity != granularities.DAY:
+                queryset = self.filter_period_last_dates(queryset, granularity)
         else:
             # No date filter supplied, so only return data for the latest date
-            latest_date = queryset.aggregate(Max('date'))
-            if latest_date:
-                latest_date = latest_date['date__max']
-                queryset = queryset.filter(date=latest_date)
+            queryset = self.filter_latest_date(queryset, 'date')
         return queryset
 
 
@@ -307,6 +443,15 @@ class CourseEnrollmentByBirthYearView(BaseCourseEnrollmentView):
         start_date -- Date after which enrolled students are counted (inclusive).
 
         end_date -- Date before which enrolled students are counted (exclusive).
+
+        granularity -- Period of the returned counts: day (default), week, or month. Counts are totals as of a date,
+        so the counts of the last date with data in each week (starting on Monday) or month are returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+
+        page_size -- Number of results to return per page. All results are returned by default.
+
+        cursor -- Position of the page to return. The URL of the next page is returned in the Link header.
     """
 
     slug = u'enrollment-age'
@@ -349,6 +494,15 @@ class CourseEnrollmentByEducationView(BaseCourseEnrollmentView):
         start_date -- Date after which enrolled students are counted (inclusive).
 
         end_date -- Date before which enrolled students are counted (exclusive).
+
+        granularity -- Period of the returned counts: day (default), week, or month. Counts are totals as of a date,
+        so the counts of the last date with data in each week (starting on Monday) or month are returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+
+        page_size -- Number of results to return per page. All results are returned by default.
+
+        cursor -- Position of the page to return. The URL of the next page is returned in the Link header.
     """
     slug = u'enrollment-education'
     serializer_class = serializers.CourseEnrollmentByEducationSerializer
@@ -389,33 +543,37 @@ class CourseEnrollmentByGenderView(BaseCourseEnrollmentView):
         start_date -- Date after which enrolled students are counted (inclusive).
 
         end_date -- Date before which enrolled students are counted (exclusive).
+
+        granularity -- Period of the returned counts: day (default), week, or month. Counts are totals as of a date,
+        so the counts of the last date with data in each week (starting on Monday) or month are returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+
+        page_size -- Number of results to return per page. All results are returned by default.
+
+        cursor -- Position of the page to return. The URL of the next page is returned in the Link header.
     """
     slug = u'enrollment-gender'
     serializer_class = serializers.CourseEnrollmentByGenderSerializer
     model = models.CourseEnrollmentByGender
+    cursor_fields = ('date', 'course_id')
 
-    def get_queryset(self):
-        queryset = super(CourseEnrollmentByGenderView, self).get_queryset()
-        formatted_data = []
-
-        for key, group in groupby(queryset, lambda x: (x.course_id, x.date)):
-            # Iterate over groups and create a single item with gender data
-            item = {
-                u'course_id': key[0],
-                u'date': key[1],
-                u'created': None
-            }
+    def aggregate_queryset(self, queryset):
+        """ Group the data by date and combine the counts for each gender into a single row. """
+        cleaned_genders = self.model.CLEANED_GENDERS
+        counts = dict((gender, ConditionalSum('count', 'gender', [code])) for code, gender in cleaned_genders.items())
 
-            for enrollment in group:
-                gender = enrollment.cleaned_gender.lower()
-                count = item.get(gender, 0)
-                count += enrollment.count
-                item[gender] = count
-                item[u'created'] = max(enrollment.created, item[u'created']) if item[u'created'] else enrollment.created
+        # Null, and any other unexpected value, is counted as unknown.
+        counts[genders.UNKNOWN] = ConditionalSum('count', 'gender', cleaned_genders.keys(), negate=True)
 
-            formatted_data.append(item)
+        queryset = queryset.values('course_id', 'date').annotate(last_created=Max('created'), **counts)
+        return queryset.order_by('date', 'course_id')
 
-        return formatted_data
+    def format_data(self, data):
+        # Annotations cannot share the name of a model field, so the creation date is renamed after it is retrieved.
+        for item in data:
+            item[u'created'] = item.pop('last_created')
+            yield item
 
 
 class CourseEnrollmentView(BaseCourseEnrollmentView):
@@ -449,6 +607,15 @@ class CourseEnrollmentView(BaseCourseEnrollmentView):
         start_date -- Date after which enrolled students are counted (inclusive).
 
         end_date -- Date before which enrolled students are counted (exclusive).
+
+        granularity -- Period of the returned counts: day (default), week, or month. Counts are totals as of a date,
+        so the counts of the last date with data in each week (starting on Monday) or month are returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+
+        page_size -- Number of results to return per page. All results are returned by default.
+
+        cursor -- Position of the page to return. The URL of the next page is returned in the Link header.
     """
     slug = u'enrollment'
     serializer_class = serializers.CourseEnrollmentDailySerializer
@@ -489,39 +656,203 @@ class CourseEnrollmentModeView(BaseCourseEnrollmentView):
         start_date -- Date after which enrolled students are counted (inclusive).
 
         end_date -- Date before which enrolled students are counted (exclusive).
+
+        granularity -- Period of the returned counts: day (default), week, or month. Counts are totals as of a date,
+        so the counts of the last date with data in each week (starting on Monday) or month are returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+
+        page_size -- Number of results to return per page. All results are returned by default.
+
+        cursor -- Position of the page to return. The URL of the next page is returned in the Link header.
     """
 
     slug = u'enrollment_mode'
     serializer_class = serializers.CourseEnrollmentModeDailySerializer
     model = models.CourseEnrollmentModeDaily
+    cursor_fields = ('date', 'course_id')
 
-    def get_queryset(self):
-        queryset = super(CourseEnrollmentModeView, self).get_queryset()
-        formatted_data = []
+    def aggregate_queryset(self, queryset):
+        """ Group the data by date and combine the counts for each enrollment mode into a single row. """
+        counts = {
+            # Merge audit and honor
+            enrollment_modes.HONOR: ConditionalSum('count', 'mode', [enrollment_modes.HONOR, enrollment_modes.AUDIT]),
+            enrollment_modes.PROFESSIONAL: ConditionalSum('count', 'mode', [enrollment_modes.PROFESSIONAL]),
+            enrollment_modes.VERIFIED: ConditionalSum('count', 'mode', [enrollment_modes.VERIFIED]),
+        }
 
-        for key, group in groupby(queryset, lambda x: (x.course_id, x.date)):
-            item = {
-                u'course_id': key[0],
-                u'date': key[1],
-                u'created': None
-            }
+        queryset = queryset.values('course_id', 'date').annotate(
+            last_created=Max('created'), total=Sum('count'), **counts)
+        return queryset.order_by('date', 'course_id')
 
-            total = 0
+    def format_data(self, data):
+        # Annotations cannot share the name of a model field, so these are renamed after they are retrieved.
+        for item in data:
+            item[u'created'] = item.pop('last_created')
+            item[u'count'] = item.pop('total')
+            yield item
 
-            for enrollment in group:
-                mode = enrollment.mode
-                item[mode] = enrollment.count
-                item[u'created'] = max(enrollment.created, item[u'created']) if item[u'created'] else enrollment.created
-                total += enrollment.count
 
-            # Merge audit and honor
-            item[enrollment_modes.HONOR] = item.get(enrollment_modes.HONOR, 0) + item.pop(enrollment_modes.AUDIT, 0)
+class BulkCourseViewMixin(GroupedResponseMixin):
+    """
+    Returns the data of several courses, keyed by course ID, instead of that of a single course.
+
+    The courses are specified with the course_ids parameter, either in the query string or, for long lists, in the body
+    of a POST request. The data of every course is retrieved with a single query to each database that holds some of
+    it, after the latest dates of the courses are looked up if no dates are specified.
+    """
+
+    group_by = 'course_id'
+    _course_ids = None
+
+    def get_course_ids(self):
+        if self._course_ids is None:
+            if self.request.method == 'POST':
+                if not isinstance(self.request.DATA, dict):
+                    raise ParseError(u'The body of the request must be an object with a list of course_ids.')
+                course_ids = self.request.DATA.get('course_ids', '')
+            else:
+                course_ids = self.request.QUERY_PARAMS.get('course_ids', '')
+
+            if isinstance(course_ids, basestring):
+                course_ids = course_ids.split(',')
+            elif not isinstance(course_ids, list):
+                raise ParseError(u'course_ids must be a list of course IDs.')
+
+            self._course_ids = sorted(set(unicode(course_id).strip() for course_id in course_ids) - {u''})
+
+            if not self._course_ids:
+                raise NotAcceptable
+
+        return self._course_ids
+
+    def get_response_key_parts(self, request):
+        # Course IDs may be POSTed, in which case they are not part of the query parameters.
+        return super(BulkCourseViewMixin, self).get_response_key_parts(request) + self.get_course_ids()
+
+    def post(self, request, *args, **kwargs):
+        return self.get(request, *args, **kwargs)
+
+    def get_model_querysets(self):
+        # The courses may be held by several databases, from which their data is retrieved separately, and merged.
+        course_ids = {}
+        for course_id in self.get_course_ids():
+            course_ids.setdefault(sharding.get_course_database(course_id), course_id)
+
+        return [self.get_course_model_queryset(course_ids[database]) for database in sorted(course_ids)]
+
+    def filter_courses(self, queryset):
+        return queryset.filter(course_id__in=self.get_course_ids())
+
+    def get_database_course_ids(self, queryset):
+        """ Returns the requested courses whose data is held by the database the queryset reads from. """
+        # The queryset of each database is routed with the hint of one of its courses (see get_model_querysets).
+        database = sharding.get_course_database(queryset._hints['course_id'])  # pylint: disable=protected-access
+        return [course_id for course_id in self.get_course_ids() if sharding.get_course_database(course_id) == database]
+
+    def get_latest_dates(self, queryset, field_name):
+        """
+        Returns the latest value of the given date field for each requested course held by the queryset's database.
+
+        The latest dates are looked up in the CourseLatestDate table with a single query. Courses that have not been
+        recorded there yet are aggregated over, with another query, only if there are any.
+        """
+        field = self.model._meta.get_field(field_name)  # pylint: disable=protected-access
+        course_ids = self.get_database_course_ids(queryset)
+
+        latest_dates = models.CourseLatestDate.objects.using(queryset.db).filter(
+            table_name=self.model._meta.db_table, course_id__in=course_ids)  # pylint: disable=protected-access
+        latest_dates = dict(latest_dates.values_list('course_id', 'latest_date'))
+
+        if not isinstance(field, DateTimeField):
+            latest_dates = dict((course_id, date.date()) for course_id, date in latest_dates.items())
+
+        missing = [course_id for course_id in course_ids if course_id not in latest_dates]
+        if missing:
+            rows = self.model.objects.using(queryset.db).filter(course_id__in=missing).values('course_id')
+            rows = rows.annotate(latest_date=Max(field_name)).order_by()
+            latest_dates.update((row['course_id'], row['latest_date']) for row in rows)
+
+        return latest_dates
+
+    def filter_latest_date(self, queryset, field_name):
+        """
+        Filter the queryset to the rows with the latest value of the given date field of each course.
+
+        The latest dates are resolved before the data is retrieved, so that the data is filtered on (course ID, date)
+        pairs rather than with subqueries evaluated for every row.
+        """
+        latest_dates = [(course_id, date) for course_id, date in self.get_latest_dates(queryset, field_name).items()
+                        if date is not None]
+
+        if not latest_dates:
+            return queryset.none()
+
+        return queryset.filter(reduce(operator.or_, [Q(course_id=course_id, **{field_name: date})
+                                                     for course_id, date in sorted(latest_dates)]))
+
+    def handle_empty_data(self):
+        # Courses without data are omitted from the results.
+        pass
+
+    def get_csv_filename(self):
+        return u'courses--{0}.csv'.format(self.slug)
+
+
+class CourseEnrollmentBulkView(BulkCourseViewMixin, CourseEnrollmentView):
+    """
+    Get the number of enrolled users in several courses.
+
+    **Example requests**
+
+        GET /api/v0/courses/enrollment/?course_ids={course_id},{course_id}
+
+        POST /api/v0/courses/enrollment/
+
+    **Response Values**
+
+        Returns the counts of enrolled users, in the same format as the
+        enrollment endpoint of a single course, keyed by course ID. Courses
+        without data are omitted.
+
+    **Parameters**
+
+        course_ids -- Comma-separated list of the IDs of the courses whose data should be returned. The body of POST
+        requests may instead contain a JSON object with a list of course IDs.
 
-            item[u'count'] = total
+        All of the parameters of the enrollment endpoint of a single course are also supported. Unless dates are
+        specified, the data of the latest date of each course is returned.
+    """
+
+    slug = u'enrollment'
+
+
+class CourseEnrollmentModeBulkView(BulkCourseViewMixin, CourseEnrollmentModeView):
+    """
+    Get the number of enrolled users by enrollment mode in several courses.
+
+    **Example requests**
+
+        GET /api/v0/courses/enrollment/mode/?course_ids={course_id},{course_id}
+
+        POST /api/v0/courses/enrollment/mode/
+
+    **Response Values**
 
-            formatted_data.append(item)
+        Returns the counts of users by mode, in the same format as the
+        enrollment mode endpoint of a single course, keyed by course ID.
+        Courses without data are omitted.
 
-        return formatted_data
+    **Parameters**
+
+        course_ids -- Comma-separated list of the IDs of the courses whose data should be returned. The body of POST
+        requests may instead contain a JSON object with a list of course IDs.
+
+        All of the parameters of the enrollment mode endpoint of a single course are also supported. Unless dates are
+        specified, the data of the latest date of each course is returned.
+    """
+
+    slug = u'enrollment_mode'
 
 
 # pylint: disable=line-too-long
@@ -566,45 +897,100 @@ class CourseEnrollmentByLocationView(BaseCourseEnrollmentView):
         start_date -- Date after which enrolled students are counted (inclusive).
 
         end_date -- Date before which enrolled students are counted (exclusive).
+
+        granularity -- Period of the returned counts: day (default), week, or month. Counts are totals as of a date,
+        so the counts of the last date with data in each week (starting on Monday) or month are returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
     """
 
     slug = u'enrollment-location'
     serializer_class = serializers.CourseEnrollmentByCountrySerializer
     model = models.CourseEnrollmentByCountry
 
-    def get_queryset(self):
-        # Get all of the data from the database
-        queryset = super(CourseEnrollmentByLocationView, self).get_queryset()
-        items = queryset.all()
-
-        # Data must be sorted in order for groupby to work properly
-        items = sorted(items, key=lambda x: x.country.alpha2)
-
-        # Items to be returned by this method
-        returned_items = []
-
-        # Group data by date, country, and course ID
-        for key, group in groupby(items, lambda x: (x.date, x.country.alpha2, x.course_id)):
-            count = 0
-            date = key[0]
-            country_code = key[1]
-            course_id = key[2]
-            created = None
-
-            for item in group:
-                created = max(created, item.created) if created else item.created
-                count += item.count
-
-            # pylint: disable=no-value-for-parameter,unexpected-keyword-arg
-            returned_items.append(models.CourseEnrollmentByCountry(
-                course_id=course_id,
-                date=date,
-                country_code=country_code,
-                count=count,
-                created=created
-            ))
-
-        # Note: We are returning a list, instead of a queryset. This is
-        # acceptable since the consuming code simply expects the returned
-        # value to be iterable, not necessarily a queryset.
-        return returned_items
+    # Codes are merged into countries, and sorted by country, after the rows are retrieved, so rows cannot be paginated
+    # in the database.
+    cursor_fields = ()
+
+    def aggregate_queryset(self, queryset):
+        # Sum the counts in the database. Codes that resolve to the same country are combined by format_data.
+        queryset = queryset.values('date', 'course_id', 'country_code')
+        queryset = queryset.annotate(total=Sum('count'), last_created=Max('created'))
+        return queryset.order_by('date', 'course_id', 'country_code')
+
+    def format_data(self, data):
+        # Group data by date, country, and course ID. Several codes (e.g. empty and invalid codes, which resolve to
+        # UNKNOWN) may map to the same country.
+        items = OrderedDict()
+
+        for row in data:
+            country = get_country(row['country_code'])
+            key = (row['date'], country.alpha2, row['course_id'])
+            item = items.get(key)
+
+            if item is None:
+                items[key] = {
+                    u'course_id': row['course_id'],
+                    u'date': row['date'],
+                    u'country': country,
+                    u'count': row['total'],
+                    u'created': row['last_created'],
+                }
+            else:
+                item[u'count'] += row['total']
+                item[u'created'] = max(item[u'created'], row['last_created'])
+
+        # The rows are ordered by date, so a stable sort by country (UNKNOWN first) keeps them in date order.
+        return sorted(items.values(), key=lambda item: item[u'country'].alpha2)
+
+
+class CourseProblemsListView(BaseCourseView):
+    """
+    Get the number of submissions to each problem in a course.
+
+    **Example request**
+
+        GET /api/v0/courses/{course_id}/problems/
+
+    **Response Values**
+
+        Returns a collection for each problem in the course that has been
+        answered. Each collection contains:
+
+            * module_id: The ID of the problem.
+            * total: Total number of submissions.
+            * correct: Total number of *correct* submissions.
+            * percent_correct: Percentage of submissions that were correct.
+
+    **Parameters**
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+
+        page_size -- Number of results to return per page. All results are returned by default.
+
+        cursor -- Position of the page to return. The URL of the next page is returned in the Link header.
+    """
+
+    slug = u'problems'
+    serializer_class = serializers.CourseProblemSerializer
+    model = models.ProblemResponseAnswerDistribution
+    cursor_fields = ('module_id',)
+
+    def apply_date_filtering(self, queryset):
+        # Answer distributions are not dated.
+        return queryset
+
+    def aggregate_queryset(self, queryset):
+        """ Sum the submissions to each problem, without retrieving the answers. """
+        queryset = queryset.values('module_id').annotate(
+            total=Sum('count'),
+            correct=ConditionalSum('count', 'correct', [True])
+        )
+        return queryset.order_by('module_id')
+
+    def format_data(self, data):
+        for item in data:
+            # The sum of correct submissions is NULL if none of the answers are correct.
+            item[u'correct'] = item['correct'] or 0
+            item[u'percent_correct'] = 100.0 * item['correct'] / item['total'] if item['total'] else 0.0
+            yield item
@@ -1,5 +1,5 @@
-from itertools import groupby
-
+from django.db.models import Sum
+from django.utils.datastructures import SortedDict
 from rest_framework import generics
 from rest_framework.exceptions import NotAcceptable
 
@@ -10,9 +10,13 @@ from analytics_data_api.v0.models import GradeDistribution
 from analytics_data_api.v0.serializers import GradeDistributionSerializer
 from analytics_data_api.v0.models import SequentialOpenDistribution
 from analytics_data_api.v0.serializers import SequentialOpenDistributionSerializer
+from analytics_data_api.v0.aggregates import ConditionalSum
+from analytics_data_api.v0.views import ConditionalResponseMixin, FieldProjectionMixin, GroupedResponseMixin, \
+    KeysetPaginationMixin, StreamingListMixin, scatter_gather
 
 
-class SubmissionCountsListView(generics.ListAPIView):
+class SubmissionCountsListView(ConditionalResponseMixin, FieldProjectionMixin, StreamingListMixin,
+                               generics.ListAPIView):
     """
     Get the number of submissions to one, or more, problems.
 
@@ -31,8 +35,11 @@ class SubmissionCountsListView(generics.ListAPIView):
 
     **Parameters**
         problem_ids -- Comma-separated list of problem IDs representing the problems whose data should be returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
     """
 
+    model = ProblemResponseAnswerDistribution
     serializer_class = ProblemSubmissionCountSerializer
     allow_empty = False
 
@@ -43,30 +50,34 @@ class SubmissionCountsListView(generics.ListAPIView):
             raise NotAcceptable
 
         problem_ids = problem_ids.split(',')
-        queryset = ProblemResponseAnswerDistribution.objects.filter(module_id__in=problem_ids).order_by('module_id')
+        queryset = ProblemResponseAnswerDistribution.objects.filter(module_id__in=problem_ids)
 
-        data = []
+        # Only the totals are needed, so sum the counts in the database instead of retrieving every answer (including
+        # the answer and question text).
+        queryset = queryset.values('module_id').annotate(
+            total=Sum('count'),
+            correct=ConditionalSum('count', 'correct', [True])
+        ).order_by('module_id')
 
-        for problem_id, distribution in groupby(queryset, lambda x: x.module_id):
-            total = 0
-            correct = 0
+        data = []
 
-            for answer in distribution:
-                count = answer.count
-                total += count
-                if answer.correct:
-                    correct += count
+        # The problems may be in courses held by different databases, so their counts are retrieved from each.
+        for item in scatter_gather(queryset):
+            # The sum of correct submissions is NULL if none of the answers are correct.
+            item['correct'] = item['correct'] or 0
 
-            data.append({
-                'module_id': problem_id,
-                'total': total,
-                'correct': correct
-            })
+            if data and data[-1]['module_id'] == item['module_id']:
+                # The answers to the problem are held by several databases, so the counts of each are added up.
+                data[-1]['total'] += item['total']
+                data[-1]['correct'] += item['correct']
+            else:
+                data.append(item)
 
         return data
 
 
-class ProblemResponseAnswerDistributionView(generics.ListAPIView):
+class ProblemResponseAnswerDistributionView(ConditionalResponseMixin, KeysetPaginationMixin, FieldProjectionMixin,
+                                            StreamingListMixin, generics.ListAPIView):
     """
     Get the distribution of student answers to a specific problem.
 
@@ -96,18 +107,84 @@ class ProblemResponseAnswerDistributionView(generics.ListAPIView):
             * variant: For randomized problems, the random seed used. If problem
               is not randomized, value is null.
             * created: The date the count was computed.
+
+        If hoisting is requested, the fields that are the same for every
+        answer are returned once instead of in each collection:
+
+            * course_id: The ID of the course for which data is returned.
+            * module_id: The ID of the problem.
+            * parts: A list of the parts of the problem. Each part contains
+              the part_id, problem_display_name and question_text fields, as
+              well as a list of the answers to the part, which contain the
+              remaining fields.
+
+    **Parameters**
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+
+        hoist -- If ``true``, return the fields that are the same for every answer once, as described above.
+
+        page_size -- Number of answers to return per page. All answers are returned by default.
+
+        cursor -- Position of the page to return. The URL of the next page is returned in the Link header.
     """
 
+    model = ProblemResponseAnswerDistribution
     serializer_class = ProblemResponseAnswerDistributionSerializer
     allow_empty = False
 
+    # Fields that are the same for every answer to the problem, and for every answer to a part of the problem
+    problem_fields = ('course_id', 'module_id')
+    part_fields = ('part_id', 'problem_display_name', 'question_text')
+
+    # Answers are paginated by part. The ID breaks ties, since several answers may have the same value (e.g. NULL).
+    cursor_fields = ('part_id', 'id')
+
     def get_queryset(self):
         """Select all the answer distribution response having to do with this usage of the problem."""
         problem_id = self.kwargs.get('problem_id')
-        return ProblemResponseAnswerDistribution.objects.filter(module_id=problem_id)
+        queryset = ProblemResponseAnswerDistribution.objects.filter(module_id=problem_id)
+        return self.trim_page(scatter_gather(self.seek_page(self.project_queryset(queryset))))
+
+    def hoist_fields(self, answers):
+        """
+        Returns the answers grouped by part, with the fields that are the same for every answer to the problem, or to a
+        part, moved out of the individual answers.
+        """
+        problem = SortedDict()
+        parts = SortedDict()
+
+        for answer in answers:
+            for name in self.problem_fields:
+                if name in answer:
+                    problem[name] = answer.pop(name)
+
+            part_values = [(name, answer.pop(name)) for name in self.part_fields if name in answer]
+            part = parts.get(tuple(part_values))
 
+            if part is None:
+                part = SortedDict(part_values)
+                part['answers'] = []
+                parts[tuple(part_values)] = part
 
-class GradeDistributionView(generics.ListAPIView):
+            part['answers'].append(answer)
+
+        problem['parts'] = parts.values()
+        return problem
+
+    def list(self, request, *args, **kwargs):
+        response = super(ProblemResponseAnswerDistributionView, self).list(request, *args, **kwargs)
+
+        # Nested data cannot be represented in CSV, and streamed rows are rendered as they are serialized, so hoisting
+        # only applies to responses that are rendered all at once in other formats.
+        hoist = request.QUERY_PARAMS.get('hoist', '').lower() == 'true'
+        if hoist and not response.streaming and request.accepted_renderer.format != 'csv':
+            response.data = self.hoist_fields(response.data)
+
+        return response
+
+
+class GradeDistributionView(ConditionalResponseMixin, FieldProjectionMixin, StreamingListMixin, generics.ListAPIView):
     """
     Get the distribution of grades for a specific problem.
 
@@ -127,18 +204,24 @@ class GradeDistributionView(generics.ListAPIView):
               given.
             * max_grade: The highest possible grade for this problem.
             * created: The date the count was computed.
+
+    **Parameters**
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
     """
 
+    model = GradeDistribution
     serializer_class = GradeDistributionSerializer
     allow_empty = False
 
     def get_queryset(self):
         """Select all grade distributions for a particular module"""
         problem_id = self.kwargs.get('problem_id')
-        return GradeDistribution.objects.filter(module_id=problem_id)
+        return scatter_gather(self.project_queryset(GradeDistribution.objects.filter(module_id=problem_id)))
 
 
-class SequentialOpenDistributionView(generics.ListAPIView):
+class SequentialOpenDistributionView(ConditionalResponseMixin, FieldProjectionMixin, StreamingListMixin,
+                                     generics.ListAPIView):
     """
     Get the number of views of a subsection, or sequential, in the course.
 
@@ -155,12 +238,89 @@ class SequentialOpenDistributionView(generics.ListAPIView):
             * module_id: The ID of the subsection, or sequential.
             * count: The number of times the subsection was viewed.
             * created: The date the count computed.
+
+    **Parameters**
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
     """
 
+    model = SequentialOpenDistribution
     serializer_class = SequentialOpenDistributionSerializer
     allow_empty = False
 
     def get_queryset(self):
         """Select the view count for a specific module"""
         module_id = self.kwargs.get('module_id')
-        return SequentialOpenDistribution.objects.filter(module_id=module_id)
+        return scatter_gather(self.project_queryset(SequentialOpenDistribution.objects.filter(module_id=module_id)))
+
+
+class BatchModuleViewMixin(GroupedResponseMixin):
+    """
+    Returns the data of several modules, grouped by module ID, instead of that of a single module.
+
+    The modules are specified with a comma-separated list of IDs in the ids_param query parameter. The data of every
+    module is retrieved with a single query.
+    """
+
+    group_by = 'module_id'
+    ids_param = None
+
+    def get_module_ids(self):
+        module_ids = self.request.QUERY_PARAMS.get(self.ids_param, '')
+
+        if not module_ids:
+            raise NotAcceptable
+
+        return module_ids.split(',')
+
+    def get_queryset(self):
+        queryset = self.model.objects.filter(module_id__in=self.get_module_ids()).order_by('module_id', 'id')
+        return scatter_gather(self.project_queryset(queryset))
+
+
+class GradeDistributionBatchView(BatchModuleViewMixin, GradeDistributionView):
+    """
+    Get the distribution of grades for several problems.
+
+    **Example request**
+
+        GET /api/v0/problems/grade_distribution/?problem_ids={problem_id},{problem_id}
+
+    **Response Values**
+
+        Returns the collections returned for each problem by the grade
+        distribution endpoint of a single problem, keyed by problem ID.
+        Problems without data are omitted.
+
+    **Parameters**
+
+        problem_ids -- Comma-separated list of problem IDs representing the problems whose data should be returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+    """
+
+    ids_param = 'problem_ids'
+
+
+class SequentialOpenDistributionBatchView(BatchModuleViewMixin, SequentialOpenDistributionView):
+    """
+    Get the number of views of several subsections, or sequentials.
+
+    **Example request**
+
+        GET /api/v0/problems/sequential_open_distribution/?module_ids={module_id},{module_id}
+
+    **Response Values**
+
+        Returns the collections returned for each subsection by the
+        sequential open distribution endpoint of a single subsection, keyed
+        by module ID. Subsections without data are omitted.
+
+    **Parameters**
+
+        module_ids -- Comma-separated list of the IDs of the subsections whose data should be returned.
+
+        fields -- Comma-separated list of the fields to return. All fields are returned by default.
+    """
+
+    ids_param = 'module_ids'
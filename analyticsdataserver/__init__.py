@@ -0,0 +1 @@
+default_app_config = 'analyticsdataserver.apps.AnalyticsDataServerConfig'  # pylint: disable=invalid-name
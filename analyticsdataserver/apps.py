@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class AnalyticsDataServerConfig(AppConfig):
+    name = 'analyticsdataserver'
+    verbose_name = 'Analytics Data Server'
+
+    def ready(self):
+        # Connect the receivers that manage the reuse of database connections, time their queries, and track the
+        # health of read replicas.
+        from analyticsdataserver import db  # pylint: disable=unused-variable
+        from analyticsdataserver import metrics  # pylint: disable=unused-variable
+        from analyticsdataserver import router  # pylint: disable=unused-variable
@@ -0,0 +1,123 @@
+"""
+Reuse of database connections across requests.
+
+Django keeps a connection open for CONN_MAX_AGE seconds, so that later requests handled by the same thread reuse it
+instead of connecting again. Each thread has its own connection to each database, so the connections of a process form
+a pool of at most one connection per thread and database. This module checks that reused connections still work, and
+records the state of the pools for monitoring.
+"""
+
+import threading
+import time
+from weakref import WeakValueDictionary
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+class ConnectionPool(object):
+    """ Statistics of the connections of a process to a database. """
+
+    def __init__(self):
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+
+        # The connection wrapper of each thread, by id. Wrappers compare equal if they are for the same database.
+        self.wrappers = WeakValueDictionary()
+
+    def get_open(self):
+        return len([wrapper for wrapper in self.wrappers.values() if wrapper.connection is not None])
+
+
+_pools = {}
+_lock = threading.Lock()
+
+# Connections are only used by the thread that opened them, so the time at which each connection of a thread was last
+# used by a request is stored per thread, by database alias.
+_local = threading.local()
+
+
+def _get_last_used():
+    if not hasattr(_local, 'last_used'):
+        _local.last_used = {}
+    return _local.last_used
+
+
+def _get_pool(alias):
+    if alias not in _pools:
+        _pools[alias] = ConnectionPool()
+    return _pools[alias]
+
+
+@receiver(connection_created)
+def record_connection(sender, connection, **kwargs):  # pylint: disable=unused-argument
+    with _lock:
+        pool = _get_pool(connection.alias)
+        pool.opened += 1
+        pool.wrappers[id(connection)] = connection
+
+    _get_last_used()[connection.alias] = time.time()
+
+
+@receiver(request_started)
+def check_reused_connections(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Checks connections that have been idle for at least DATABASE_HEALTH_CHECK_INTERVAL seconds before they are reused.
+
+    Connections closed by the server (e.g. after MySQL's wait_timeout) are discarded, so that the request connects again
+    instead of failing.
+    """
+    now = time.time()
+    last_used = _get_last_used()
+
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+
+        with _lock:
+            pool = _get_pool(connection.alias)
+            pool.reused += 1
+
+        idle = now - last_used.get(connection.alias, now)
+        if idle >= settings.DATABASE_HEALTH_CHECK_INTERVAL and not connection.is_usable():
+            connection.close()
+
+            with _lock:
+                pool.discarded += 1
+
+
+@receiver(request_finished)
+def record_connection_use(sender, **kwargs):  # pylint: disable=unused-argument
+    now = time.time()
+    last_used = _get_last_used()
+
+    for connection in connections.all():
+        if connection.connection is not None:
+            last_used[connection.alias] = now
+
+
+def get_pool_stats():
+    """
+    Returns the state of the connection pool of each database.
+
+    The state includes the number of open connections, and the number of connections opened, reused by a request, and
+    discarded because they no longer worked, since the process started.
+    """
+    stats = {}
+
+    with _lock:
+        for alias in connections:
+            pool = _get_pool(alias)
+            stats[alias] = {
+                'open': pool.get_open(),
+                'opened': pool.opened,
+                'reused': pool.reused,
+                'discarded': pool.discarded,
+                'max_age': connections.databases[alias].get('CONN_MAX_AGE', 0),
+            }
+
+    return stats
@@ -0,0 +1,155 @@
+"""
+Health of the dependencies of the API, probed in the background.
+
+Health checks are requested often (e.g. by load balancers), so instead of querying the database for each of them, a
+thread of each process probes the dependencies every HEALTH_PROBE_INTERVAL seconds, and health checks return the
+results of the last probe. Health checks are then answered without waiting for the dependencies, and add no load to
+them, so a slow database only delays the probe.
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.dispatch import Signal
+from django.utils.timezone import utc
+
+logger = logging.getLogger(__name__)
+
+OK = 'OK'
+UNAVAILABLE = 'UNAVAILABLE'
+
+CACHE_KEY = 'health-probe'
+
+# Sent by each probe for every read replica, so that other modules can check replicas without waiting on them.
+replica_probed = Signal(providing_args=['alias'])
+
+# The results of the last probe, replaced as a whole by each probe so that they can be read without locking.
+_results = None
+
+# The process probing in the background. Threads are not copied when a process is forked (e.g. by gunicorn), so each
+# process starts its own.
+_probe_pid = None
+_lock = threading.Lock()
+
+
+def check_database(alias):
+    connection = connections[alias]
+
+    # The probe keeps its connection open, so replace it if it no longer works (e.g. after the database restarted).
+    if connection.connection is not None and not connection.is_usable():
+        connection.close()
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def check_cache():
+    value = str(time.time())
+    cache.set(CACHE_KEY, value)
+
+    if cache.get(CACHE_KEY) != value:
+        raise ValueError('The cache did not return the value stored.')
+
+
+def _run_check(name, check, *args):
+    """ Returns the status of a dependency, and the number of milliseconds it took to check it. """
+    start = time.time()
+
+    try:
+        check(*args)
+        status = OK
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('Health check of %s failed.', name)
+        status = UNAVAILABLE
+
+    return status, round((time.time() - start) * 1000, 3)
+
+
+def probe():
+    """
+    Checks the health of the database, its read replicas and the cache, and records the results. Replicas are also
+    checked by the receivers of replica_probed (e.g. the router, which ejects those that are lagging).
+    """
+    global _results  # pylint: disable=global-statement
+    results = {}
+
+    database = getattr(settings, 'ANALYTICS_DATABASE', 'default')
+    results['database_connection'], results['database_latency'] = _run_check(database, check_database, database)
+
+    results['replicas'] = {}
+    for alias in sorted(settings.ANALYTICS_DATABASE_REPLICAS):
+        status, latency = _run_check(alias, check_database, alias)
+        results['replicas'][alias] = {'status': status, 'latency': latency}
+        replica_probed.send(sender=None, alias=alias)
+
+    results['cache'], results['cache_latency'] = _run_check('the cache', check_cache)
+
+    _results = (time.time(), results)
+
+
+def _probe_periodically():
+    while True:
+        try:
+            probe()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Failed to probe the health of the dependencies.')
+
+        time.sleep(settings.HEALTH_PROBE_INTERVAL)
+
+
+def start_probe():
+    """ Starts probing in the background, unless this process already does. """
+    global _probe_pid  # pylint: disable=global-statement
+
+    with _lock:
+        if _probe_pid == os.getpid():
+            return
+        _probe_pid = os.getpid()
+
+    thread = threading.Thread(target=_probe_periodically, name='health-probe')
+    thread.daemon = True
+    thread.start()
+
+
+def get_health():
+    """
+    Returns the overall status, and the results of the last probe with the time at which it ran and its age in seconds.
+
+    The overall status is that of the database. Replicas and the cache are not required to serve requests, since reads
+    are sent to the database if no replica is available, and responses are rendered again if they are not cached. The
+    status is also UNAVAILABLE if the last probe is older than HEALTH_PROBE_MAX_AGE seconds, which happens if probing
+    is stuck (e.g. waiting for an unresponsive database).
+
+    The dependencies are probed before returning if they have never been probed, or if HEALTH_PROBE_INTERVAL is 0.
+    """
+    if settings.HEALTH_PROBE_INTERVAL:
+        start_probe()
+
+    if _results is None or not settings.HEALTH_PROBE_INTERVAL:
+        probe()
+
+    # Read the results once, since the probe may replace them in the meantime.
+    last_probe = _results
+    probed_at = last_probe[0]
+    results = last_probe[1]
+    age = max(time.time() - probed_at, 0)
+
+    detailed_status = dict(results)
+    detailed_status['probed_at'] = datetime.datetime.fromtimestamp(probed_at, utc).strftime(settings.DATETIME_FORMAT)
+    detailed_status['age'] = round(age, 3)
+
+    overall_status = results['database_connection']
+    if age > settings.HEALTH_PROBE_MAX_AGE:
+        overall_status = UNAVAILABLE
+
+    return overall_status, detailed_status
@@ -0,0 +1,405 @@
+"""
+Metrics of the requests served by the API, exposed in the Prometheus text exposition format.
+
+MetricsMiddleware records, for each view (identified by its URL name), the latency of requests, the number of SQL
+queries they run and the time spent running them, the size of responses, and the number of responses with each status
+code. SQL queries are timed by wrapping the cursors of every database connection. The state of the database connection
+pools of each process is recorded whenever its metrics are collected or written.
+
+Each process records the metrics of the requests it serves. If METRICS_DIR is set, a thread of each process writes its
+metrics to a file of its own in that directory every METRICS_FLUSH_INTERVAL seconds, and when the process exits. The
+metrics of every running process (e.g. of every gunicorn worker) are added up when they are exposed. The files of
+processes that are no longer running are ignored, and removed.
+"""
+
+import atexit
+from bisect import bisect_left
+import errno
+import json
+import logging
+import os
+from threading import Lock, Thread, local
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from analyticsdataserver.db import get_pool_stats
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter(object):
+    """ Counts events, by the values of its labels. """
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, label_values, amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def set(self, label_values, value):
+        self.values[label_values] = value
+
+    def merge(self, label_values, value):
+        self.inc(label_values, value)
+
+    def get_samples(self, label_values, value):
+        return [(self.name, zip(self.labels, label_values), value)]
+
+
+class Gauge(Counter):
+    """ Measures a value that can go down, by the values of its labels. The values of processes are added up. """
+
+    type = 'gauge'
+
+
+class Histogram(object):
+    """
+    Counts observed values by bucket, and sums them, by the values of its labels.
+
+    Counts are stored per bucket, followed by the count of values above the last bucket and the sum of all values.
+    Buckets are only made cumulative when the histogram is exposed.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}
+
+    def _get_value(self, label_values):
+        if label_values not in self.values:
+            self.values[label_values] = [0] * (len(self.buckets) + 1) + [0]
+        return self.values[label_values]
+
+    def observe(self, label_values, value):
+        counts = self._get_value(label_values)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def merge(self, label_values, value):
+        counts = self._get_value(label_values)
+        for index, count in enumerate(value):
+            counts[index] += count
+
+    def get_samples(self, label_values, value):
+        labels = zip(self.labels, label_values)
+        samples = []
+        total = 0
+
+        for bucket, count in zip(self.buckets + ('+Inf',), value):
+            total += count
+            samples.append((self.name + '_bucket', labels + [('le', str(bucket))], total))
+
+        samples.append((self.name + '_sum', labels, value[-1]))
+        samples.append((self.name + '_count', labels, total))
+        return samples
+
+
+def get_metrics():
+    """ Returns new, empty, metrics. """
+    return [
+        Histogram('analytics_api_request_duration_seconds', 'Time taken to serve requests, including streaming.',
+                  ('view',), DURATION_BUCKETS),
+        Histogram('analytics_api_request_sql_queries', 'Number of SQL queries run by requests.', ('view',),
+                  QUERY_BUCKETS),
+        Histogram('analytics_api_request_sql_duration_seconds', 'Time taken by the SQL queries of requests.',
+                  ('view',), DURATION_BUCKETS),
+        Histogram('analytics_api_response_size_bytes', 'Size of the content of responses.', ('view',),
+                  SIZE_BUCKETS),
+        Counter('analytics_api_responses_total', 'Number of responses, by status code.', ('view', 'status')),
+        Gauge('analytics_api_database_connections_open', 'Number of open database connections.', ('database',)),
+        Counter('analytics_api_database_connections_opened_total', 'Number of database connections opened.',
+                ('database',)),
+        Counter('analytics_api_database_connections_reused_total',
+                'Number of times a request reused an open database connection.', ('database',)),
+        Counter('analytics_api_database_connections_discarded_total',
+                'Number of reused database connections that no longer worked, and were replaced.', ('database',)),
+    ]
+
+
+# The metric recording each statistic of the database connection pools
+POOL_METRICS = (
+    ('open', 'analytics_api_database_connections_open'),
+    ('opened', 'analytics_api_database_connections_opened_total'),
+    ('reused', 'analytics_api_database_connections_reused_total'),
+    ('discarded', 'analytics_api_database_connections_discarded_total'),
+)
+
+
+_metrics = dict((metric.name, metric) for metric in get_metrics())
+_lock = Lock()
+
+# Serializes writes to the metrics file of this process, without blocking the requests recording their metrics.
+_flush_lock = Lock()
+
+# The process flushing its metrics in the background. Threads are not copied when a process is forked (e.g. by
+# gunicorn), so each process starts its own.
+_flusher_pid = None
+
+# The SQL queries run by the current request.
+_local = local()
+
+
+def reset_queries():
+    _local.queries = 0
+    _local.query_duration = 0
+
+
+def get_queries():
+    return getattr(_local, 'queries', 0), getattr(_local, 'query_duration', 0)
+
+
+class TimedCursor(object):
+    """ Records the number of queries run by a database cursor, and the time taken to run them. """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def _time(self, method, *args):
+        start = time.time()
+        try:
+            return method(*args)
+        finally:
+            queries, query_duration = get_queries()
+            _local.queries = queries + 1
+            _local.query_duration = query_duration + time.time() - start
+
+    def execute(self, *args):
+        return self._time(self.cursor.execute, *args)
+
+    def executemany(self, *args):
+        return self._time(self.cursor.executemany, *args)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):  # pylint: disable=unused-argument
+    """ Wraps the cursors created by the connection, so that their queries are timed. """
+    if getattr(connection, 'queries_timed', False):
+        return
+
+    create_cursor = connection.create_cursor
+    connection.create_cursor = lambda: TimedCursor(create_cursor())
+    connection.queries_timed = True
+
+
+def get_view_name(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.view_name if resolver_match else 'unresolved'
+
+
+def record_request(view, status, duration, queries, query_duration, size):
+    """ Records the metrics of a request, and ensures that they are written to METRICS_DIR, if it is set. """
+    with _lock:
+        _metrics['analytics_api_request_duration_seconds'].observe((view,), duration)
+        _metrics['analytics_api_request_sql_queries'].observe((view,), queries)
+        _metrics['analytics_api_request_sql_duration_seconds'].observe((view,), query_duration)
+        _metrics['analytics_api_response_size_bytes'].observe((view,), size)
+        _metrics['analytics_api_responses_total'].inc((view, str(status)))
+
+    if settings.METRICS_DIR:
+        if settings.METRICS_FLUSH_INTERVAL:
+            start_flushing()
+        else:
+            flush()
+
+
+def record_pools():
+    """ Records the current state of the database connection pools of this process. """
+    stats = get_pool_stats()
+
+    with _lock:
+        for database, pool in stats.items():
+            for key, name in POOL_METRICS:
+                _metrics[name].set((database,), pool[key])
+
+
+def snapshot():
+    """
+    Returns a copy of the values of the metrics of this process, including the current state of its database
+    connection pools, by metric name.
+    """
+    record_pools()
+
+    # The values are copied while the lock is held, so that they can be read or written without holding it. The counts
+    # of histograms are lists, updated in place.
+    with _lock:
+        return dict((name, [(label_values, list(value) if isinstance(value, list) else value)
+                            for label_values, value in metric.values.items()])
+                    for name, metric in _metrics.items())
+
+
+def flush():
+    """ Writes the metrics of this process to its file in METRICS_DIR. """
+    content = snapshot()
+
+    # The file is replaced at once, so that other processes never read it partially written.
+    path = os.path.join(settings.METRICS_DIR, 'metrics-{0}.json'.format(os.getpid()))
+    temporary_path = path + '.tmp'
+
+    with _flush_lock:
+        with open(temporary_path, 'w') as metrics_file:
+            json.dump(content, metrics_file)
+        os.rename(temporary_path, path)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+
+        try:
+            if settings.METRICS_DIR:
+                flush()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Failed to write the metrics to %s.', settings.METRICS_DIR)
+
+
+def _flush_at_exit():
+    if settings.METRICS_DIR and _flusher_pid == os.getpid():
+        flush()
+
+
+def start_flushing():
+    """ Starts writing the metrics of this process to METRICS_DIR in the background, unless it already does. """
+    global _flusher_pid  # pylint: disable=global-statement
+
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+
+    thread = Thread(target=_flush_periodically, name='metrics-flush')
+    thread.daemon = True
+    thread.start()
+
+
+atexit.register(_flush_at_exit)
+
+
+def is_running(pid):
+    """ Returns True if a process with the given ID is running. """
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        # The process exists, but belongs to another user.
+        return error.errno == errno.EPERM
+    return True
+
+
+def collect():
+    """ Returns the metrics of every process writing to METRICS_DIR, or of this process if it is not set. """
+    if not settings.METRICS_DIR:
+        contents = [snapshot()]
+    else:
+        flush()
+        contents = []
+
+        for filename in sorted(os.listdir(settings.METRICS_DIR)):
+            if not filename.startswith('metrics-') or not filename.endswith('.json'):
+                continue
+
+            path = os.path.join(settings.METRICS_DIR, filename)
+
+            # The metrics of processes that exited would otherwise be added up forever.
+            pid = filename[len('metrics-'):-len('.json')]
+            if not pid.isdigit() or not is_running(int(pid)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+
+            with open(path) as metrics_file:
+                contents.append(json.load(metrics_file))
+
+    metrics = get_metrics()
+
+    for content in contents:
+        for metric in metrics:
+            for label_values, value in content.get(metric.name, []):
+                metric.merge(tuple(label_values), value)
+
+    return metrics
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render(metrics):
+    """ Renders metrics in the Prometheus text exposition format. """
+    lines = []
+
+    for metric in metrics:
+        lines.append('# HELP {0} {1}'.format(metric.name, metric.documentation))
+        lines.append('# TYPE {0} {1}'.format(metric.name, metric.type))
+
+        for label_values, value in sorted(metric.values.items()):
+            for name, labels, sample in metric.get_samples(label_values, value):
+                labels = ','.join(u'{0}="{1}"'.format(label, _escape(label_value)) for label, label_value in labels)
+                lines.append(u'{0}{{{1}}} {2}'.format(name, labels, repr(float(sample))))
+
+    return u'\n'.join(lines) + u'\n'
+
+
+class MetricsMiddleware(object):
+    """
+    Records the metrics of every request. The metrics of streamed responses are recorded once they have been streamed,
+    since their queries are run, and their content rendered, while they are streamed.
+
+    This middleware should be listed first, so that the time taken by the other middleware is included.
+    """
+
+    def process_request(self, request):
+        request.metrics_start = time.time()
+        reset_queries()
+
+    def process_response(self, request, response):
+        start = getattr(request, 'metrics_start', None)
+
+        if start is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self._measure_stream(request, response, start, response.streaming_content)
+        else:
+            self._record(request, response, start, len(response.content))
+
+        return response
+
+    def _measure_stream(self, request, response, start, content):
+        size = 0
+
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self._record(request, response, start, size)
+
+    def _record(self, request, response, start, size):
+        queries, query_duration = get_queries()
+        record_request(get_view_name(request), response.status_code, time.time() - start, queries, query_duration,
+                       size)
@@ -1,23 +1,262 @@
+import logging
+import random
+import sys
+import threading
+import time
+
 from django.conf import settings
+from django.core.signals import got_request_exception, request_finished, request_started
+from django.db import connections, DatabaseError
+from django.dispatch import receiver
+
+from analytics_data_api.v0 import sharding
+from analyticsdataserver import health
+
+logger = logging.getLogger(__name__)
+
+# Error rates are only computed for replicas that served at least this many requests since they were last checked.
+MIN_REQUESTS_FOR_ERROR_RATE = 10
+
+# The MySQL error raised by SHOW SLAVE STATUS if the user does not have the REPLICATION CLIENT privilege
+ER_SPECIFIC_ACCESS_DENIED_ERROR = 1227
+
+
+class ReplicaHealth(object):
+    """ The health of a read replica, as measured by this process. """
+
+    def __init__(self):
+        self.ejected_until = 0
+        self.lag = None
+        self.requests = 0
+        self.errors = 0
+        self.lag_denied = False
+
+
+_health = {}
+_lock = threading.Lock()
+
+# The number of times a replica has been ejected by this process, so that threads reading outside of requests notice
+# when the replica they read from is ejected.
+_ejections = 0
+
+# The database read from by the current request, or by the current thread outside of requests. All reads of a request
+# are sent to the same database, so that they are consistent with each other.
+_local = threading.local()
+
+
+def _get_health(alias):
+    if alias not in _health:
+        _health[alias] = ReplicaHealth()
+    return _health[alias]
+
+
+def get_replication_lag(alias):
+    """
+    Returns the number of seconds the replica is behind its primary, or None if it is not replicating (i.e. it is not
+    configured as a replica, or replication is stopped).
+    """
+    connection = connections[alias]
+
+    if connection.vendor != 'mysql':
+        return 0
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SHOW SLAVE STATUS')
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        columns = [column[0] for column in cursor.description]
+        return dict(zip(columns, row))['Seconds_Behind_Master']
+    finally:
+        cursor.close()
+
+
+def check_replica(alias):
+    """
+    Ejects the replica if it is lagging, unavailable, or failing requests.
+
+    This is run by the health probe (see analyticsdataserver.health), so that requests never wait for replicas to be
+    checked. Ejected replicas are not checked again until they have been ejected for ANALYTICS_REPLICA_EJECT_TIME.
+
+    The lag is not checked if ANALYTICS_REPLICA_CHECK_LAG is False. Replicas whose lag cannot be measured, because the
+    user lacks the REPLICATION CLIENT privilege, are ejected as if they were not replicating, and an error explaining
+    why is logged once.
+    """
+    global _ejections  # pylint: disable=global-statement
+
+    with _lock:
+        if time.time() < _get_health(alias).ejected_until:
+            return
+
+    lag = 0
+    lag_denied = False
+
+    if settings.ANALYTICS_REPLICA_CHECK_LAG:
+        try:
+            lag = get_replication_lag(alias)
+        except DatabaseError as error:  # pylint: disable=catching-non-exception
+            lag = None
+            error_code = error.args[0] if error.args else None  # pylint: disable=no-member
+            lag_denied = error_code == ER_SPECIFIC_ACCESS_DENIED_ERROR
+
+            if not lag_denied:
+                logger.exception('Failed to measure the replication lag of %s.', alias)
+
+    with _lock:
+        replica_health = _get_health(alias)
+        requests, errors = replica_health.requests, replica_health.errors
+        error_rate = float(errors) / requests if requests >= MIN_REQUESTS_FOR_ERROR_RATE else 0
+        replica_health.lag = lag
+        replica_health.requests = 0
+        replica_health.errors = 0
+
+        if lag_denied and not replica_health.lag_denied:
+            logger.error('Cannot measure the replication lag of %s, since the database user lacks the REPLICATION '
+                         'CLIENT privilege. Grant it, or set ANALYTICS_REPLICA_CHECK_LAG to False to read from the '
+                         'replica without checking its lag.', alias)
+        replica_health.lag_denied = lag_denied
+
+        if lag is None or lag > settings.ANALYTICS_REPLICA_MAX_LAG or \
+                error_rate > settings.ANALYTICS_REPLICA_MAX_ERROR_RATE:
+            if lag is None:
+                reason = 'its replication lag cannot be measured' if lag_denied else 'it is not replicating'
+            else:
+                reason = 'replication lag is {0} seconds'.format(lag)
+
+            logger.warning('Ejecting replica %s: %s, and error rate is %.2f.', alias, reason, error_rate)
+            replica_health.ejected_until = time.time() + settings.ANALYTICS_REPLICA_EJECT_TIME
+            _ejections += 1
+
+
+@receiver(health.replica_probed)
+def check_probed_replica(sender, alias, **kwargs):  # pylint: disable=unused-argument
+    check_replica(alias)
+
+
+def is_replica_available(alias):
+    """ Returns True if reads can be sent to the replica, according to its last check. """
+    with _lock:
+        return time.time() >= _get_health(alias).ejected_until
+
+
+def read_from_primary():
+    """
+    Sends the reads of the current request to ANALYTICS_DATABASE instead of its replicas (e.g. because the replicas may
+    not have replicated the latest data yet).
+    """
+    _local.read_database = getattr(settings, 'ANALYTICS_DATABASE', 'default')
+
+
+def choose_read_database(primary):
+    """ Returns a replica, chosen at random in proportion to its weight, or the primary if no replica is available. """
+    replicas = [(alias, weight) for alias, weight in sorted(settings.ANALYTICS_DATABASE_REPLICAS.items())
+                if weight > 0 and is_replica_available(alias)]
+
+    if not replicas:
+        return primary
+
+    point = random.uniform(0, sum(weight for _alias, weight in replicas))
+
+    for alias, weight in replicas:
+        point -= weight
+        if point <= 0:
+            break
+
+    return alias  # pylint: disable=undefined-loop-variable
+
+
+@receiver(request_started)
+def reset_read_database(sender, **kwargs):  # pylint: disable=unused-argument
+    _local.read_database = None
+    _local.in_request = True
+
+
+@receiver(got_request_exception)
+def record_replica_error(sender, **kwargs):  # pylint: disable=unused-argument
+    alias = getattr(_local, 'read_database', None)
+
+    if alias in settings.ANALYTICS_DATABASE_REPLICAS and isinstance(sys.exc_info()[1], DatabaseError):
+        with _lock:
+            _get_health(alias).errors += 1
+
+
+@receiver(request_finished)
+def record_replica_request(sender, **kwargs):  # pylint: disable=unused-argument
+    alias = getattr(_local, 'read_database', None)
+
+    if alias in settings.ANALYTICS_DATABASE_REPLICAS:
+        with _lock:
+            _get_health(alias).requests += 1
+
+    _local.read_database = None
+    _local.in_request = False
 
 
 class AnalyticsApiRouter(object):
-    def db_for_read(self, model, **hints):  # pylint: disable=unused-argument
-        return self._get_database(model)
+    """
+    Routes the models of the API to ANALYTICS_DATABASE, or, if the data is sharded (see ANALYTICS_DATABASE_SHARDS), to
+    the database that holds the course given by the course_id hint (e.g. Model.objects.db_manager(hints={...})) or by
+    the instance being saved.
+
+    Reads from ANALYTICS_DATABASE are spread across the replicas listed in ANALYTICS_DATABASE_REPLICAS, if any.
+    Replicas whose replication lag or error rate is too high are not read from until they recover, and reads are sent
+    to ANALYTICS_DATABASE if none of the replicas are available. Replicas are checked by the health probe, in the
+    background, so choosing a database only reads the results of the last check. Outside of requests (e.g. in
+    management commands), the database is chosen once per thread, and chosen again if a replica is ejected.
+    """
+
+    def db_for_read(self, model, **hints):
+        database = self._get_database(model, **hints)
+
+        if database != getattr(settings, 'ANALYTICS_DATABASE', 'default') or not settings.ANALYTICS_DATABASE_REPLICAS:
+            return database
+
+        if settings.HEALTH_PROBE_INTERVAL:
+            health.start_probe()
 
-    def _get_database(self, model):
+        read_database = getattr(_local, 'read_database', None)
+
+        # Reads outside of requests may last indefinitely, so they move off the replica they read from once it is
+        # ejected. Requests keep reading from the same database, and choose again when the next request starts.
+        if read_database is not None and not getattr(_local, 'in_request', False) and \
+                getattr(_local, 'ejections', None) != _ejections:
+            _local.ejections = _ejections
+            if read_database in settings.ANALYTICS_DATABASE_REPLICAS and not is_replica_available(read_database):
+                read_database = None
+
+        if read_database is None:
+            _local.ejections = _ejections
+            _local.read_database = read_database = choose_read_database(database)
+
+        return read_database
+
+    def _get_database(self, model, **hints):
         if model._meta.app_label == 'v0':   # pylint: disable=protected-access
+            course_id = hints.get('course_id') or getattr(hints.get('instance'), 'course_id', None)
+
+            if course_id:
+                return sharding.get_course_database(course_id)
             return getattr(settings, 'ANALYTICS_DATABASE', 'default')
 
         return None
 
-    def db_for_write(self, model, **hints):  # pylint: disable=unused-argument
-        return self._get_database(model)
+    def db_for_write(self, model, **hints):
+        return self._get_database(model, **hints)
 
     def allow_relation(self, obj1, obj2, **hints):  # pylint: disable=unused-argument
-        return self._get_database(obj1) == self._get_database(obj2)
+        return self._get_database(obj1, instance=obj1) == self._get_database(obj2, instance=obj2)
 
     def allow_migrate(self, database, model):
+        # Replicas are migrated by replication.
+        if database in settings.ANALYTICS_DATABASE_REPLICAS:
+            return False
+
+        if model._meta.app_label == 'v0':   # pylint: disable=protected-access
+            return database in sharding.get_databases()
+
         dest_db = self._get_database(model)
         if dest_db is not None:
             return database == dest_db
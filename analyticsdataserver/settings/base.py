@@ -37,6 +37,28 @@ MANAGERS = ADMINS
 
 
 ########## DATABASE CONFIGURATION
+# Number of seconds database connections are kept open, and reused by later requests, unless CONN_MAX_AGE is configured
+# for the database. Connecting takes longer than most of the queries made by the API.
+# See: https://docs.djangoproject.com/en/dev/ref/databases/#persistent-connections
+DATABASE_CONN_MAX_AGE = 60
+
+# Reused connections that have been idle for at least this many seconds are checked, and replaced if they no longer
+# work, before a request uses them. Set to 0 to check connections before every request.
+DATABASE_HEALTH_CHECK_INTERVAL = 10
+
+# The database, its replicas and the cache are probed every HEALTH_PROBE_INTERVAL seconds by a thread of each process,
+# and the health endpoint returns the results of the last probe. The system is reported as unavailable if the last
+# probe is older than HEALTH_PROBE_MAX_AGE seconds. Set HEALTH_PROBE_INTERVAL to 0 to probe on every health check.
+HEALTH_PROBE_INTERVAL = 5
+HEALTH_PROBE_MAX_AGE = 30
+
+# Directory to which each process writes the metrics of the requests it served, every METRICS_FLUSH_INTERVAL seconds
+# and when it exits, so that the metrics endpoint returns those of every running process (e.g. of every gunicorn
+# worker). If None, the metrics endpoint only returns those of the process serving it. Set METRICS_FLUSH_INTERVAL to 0
+# to write the metrics after every request.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#databases
 DATABASES = {
     'default': {
@@ -46,6 +68,7 @@ DATABASES = {
         'PASSWORD': '',
         'HOST': '',
         'PORT': '',
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
     }
 }
 ########## END DATABASE CONFIGURATION
@@ -152,6 +175,9 @@ TEMPLATE_DIRS = (
 ########## MIDDLEWARE CONFIGURATION
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#middleware-classes
 MIDDLEWARE_CLASSES = (
+    # Listed first, so that the time taken by the other middleware is included in the metrics of requests.
+    'analyticsdataserver.metrics.MetricsMiddleware',
+
     # Default Django middleware.
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -188,6 +214,7 @@ THIRD_PARTY_APPS = (
 )
 
 LOCAL_APPS = (
+    'analyticsdataserver',
     'analytics_data_api',
     'analytics_data_api.v0',
 )
@@ -244,27 +271,81 @@ REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
         # Most clients will use token authentication
-        'rest_framework.authentication.TokenAuthentication',
+        'analytics_data_api.authentication.CachedTokenAuthentication',
 
         # For the browseable API
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'analytics_data_api.renderers.JSONRenderer',
+        'analytics_data_api.renderers.StreamingJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
-        'rest_framework_csv.renderers.CSVRenderer',
+        'analytics_data_api.renderers.StreamingCSVRenderer',
     )
 }
 ########## END REST FRAMEWORK CONFIGURATION
 
 
+########## CACHE CONFIGURATION
+# See: https://docs.djangoproject.com/en/dev/ref/settings/#caches
+# The cache holds the data versions used to invalidate cached responses, so it must be shared by every process serving
+# the API (e.g. memcached or redis) whenever there is more than one. The local-memory cache is only suitable for a
+# single process, such as the development server.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+########## END CACHE CONFIGURATION
+
+
 ########## ANALYTICS DATA API CONFIGURATION
 
 ANALYTICS_DATABASE = 'default'
 DATABASE_ROUTERS = ['analyticsdataserver.router.AnalyticsApiRouter']
 
+# Read replicas of ANALYTICS_DATABASE, mapping their aliases to the share of reads each receives (e.g.
+# {'analytics_replica_1': 2, 'analytics_replica_2': 1}). All reads are sent to ANALYTICS_DATABASE if there are none.
+# The lag of MySQL replicas is measured with SHOW SLAVE STATUS, which requires the user of each replica to have the
+# REPLICATION CLIENT privilege (e.g. GRANT REPLICATION CLIENT ON *.* TO 'api'@'%'). Replicas whose lag cannot be
+# measured are not read from, unless ANALYTICS_REPLICA_CHECK_LAG is False.
+ANALYTICS_DATABASE_REPLICAS = {}
+
+# Replicas are checked by the health probe, every HEALTH_PROBE_INTERVAL seconds. Replicas that are more than
+# ANALYTICS_REPLICA_MAX_LAG seconds behind, or failed more than ANALYTICS_REPLICA_MAX_ERROR_RATE of their requests since
+# the previous check, are not read from for ANALYTICS_REPLICA_EJECT_TIME seconds. Reads are also sent to
+# ANALYTICS_DATABASE for ANALYTICS_REPLICA_MAX_LAG seconds after the data version of a table is bumped.
+ANALYTICS_REPLICA_CHECK_LAG = True
+ANALYTICS_REPLICA_MAX_LAG = 60
+ANALYTICS_REPLICA_MAX_ERROR_RATE = 0.2
+ANALYTICS_REPLICA_EJECT_TIME = 60
+
+# Splits the data across several databases by course, with a shard map class and its options (see
+# analytics_data_api.v0.sharding). Only reads from ANALYTICS_DATABASE are spread across its replicas. All of the
+# data is held by ANALYTICS_DATABASE if this is None.
+ANALYTICS_DATABASE_SHARDS = None
+
 ENABLE_ADMIN_SITE = False
 
+# Number of seconds rendered API responses are cached. Cached responses are invalidated when the data version of the
+# underlying table is bumped, so this can be long, provided that the cache is shared by every process (see CACHES).
+# Set to 0 to disable response caching.
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Number of seconds validated authentication tokens are cached, and so the longest a revoked token may still be
+# accepted. Tokens removed with the set_api_key management command are removed from the cache, which revokes them
+# immediately only if the cache is shared by every process (see CACHES).
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 5
+
+# JSON libraries used to render API responses, in order of preference. The first one that is installed is used, and
+# all of them produce identical output. The standard library is C-accelerated for compact responses, which most clients
+# request. simplejson, which is optional, renders indented responses (e.g. for the browsable API) about three times
+# faster. See benchmarks/json_rendering.py.
+JSON_RENDERER_BACKENDS = ('json',)
+
 ########## END ANALYTICS DATA API CONFIGURATION
 
 DATE_FORMAT = '%Y-%m-%d'
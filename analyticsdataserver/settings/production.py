@@ -1,6 +1,7 @@
 """Production settings and globals."""
 
 from os import environ
+import warnings
 
 # Normally you should not import ANYTHING from Django directly
 # into your settings, but ImproperlyConfigured is an exception.
@@ -44,3 +45,19 @@ DB_OVERRIDES = dict(
 
 for override, value in DB_OVERRIDES.iteritems():
     DATABASES['default'][override] = value
+
+# Reuse the connections to every database (e.g. the default database, used to authenticate, and ANALYTICS_DATABASE).
+for database in DATABASES.values():
+    database.setdefault('CONN_MAX_AGE', DATABASE_CONN_MAX_AGE)
+
+# Data versions, and the responses cached with them, must be shared by every worker. Otherwise a worker keeps serving
+# the responses it cached before the data was loaded, since it never sees the versions bumped by other processes.
+# Likewise, a worker would keep accepting the tokens it cached after they are revoked by another process. Caching is
+# therefore disabled, rather than failing to start, until a shared cache (e.g. memcached or redis) is configured.
+if CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    if RESPONSE_CACHE_TIMEOUT or AUTH_TOKEN_CACHE_TIMEOUT:
+        warnings.warn('The default cache is not shared by every process, so response and authentication token caching '
+                      'are disabled. Configure a shared cache (e.g. memcached or redis) as the default cache to enable '
+                      'them.', RuntimeWarning)
+    RESPONSE_CACHE_TIMEOUT = 0
+    AUTH_TOKEN_CACHE_TIMEOUT = 0
@@ -19,3 +19,10 @@ INSTALLED_APPS += (
 )
 
 TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
+
+# Probe the health of the dependencies on every health check, instead of in a thread that would use the test database
+# concurrently with the tests.
+HEALTH_PROBE_INTERVAL = 0
+
+# Write metrics after every request, instead of in a thread that would outlive the tests.
+METRICS_FLUSH_INTERVAL = 0
@@ -1,20 +1,32 @@
 from contextlib import contextmanager
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
 from django.db.utils import ConnectionHandler, DatabaseError
 from django.test import TestCase
 from django.test.utils import override_settings
+from django_dynamic_fixture import G
 
 import mock
 from rest_framework.authtoken.models import Token
 from analytics_data_api.v0.models import CourseEnrollmentDaily, CourseEnrollmentByBirthYear
+from analyticsdataserver import db, health, metrics, router
 from analyticsdataserver.router import AnalyticsApiRouter
 
 
 class TestCaseWithAuthentication(TestCase):
     def setUp(self):
         super(TestCaseWithAuthentication, self).setUp()
+        cache.clear()
         test_user = User.objects.create_user('tester', 'test@example.com', 'testpassword')
         self.token = Token.objects.create(user=test_user)
 
@@ -48,21 +60,66 @@ class OperationalEndpointsTest(TestCaseWithAuthentication):
 
     def assert_database_health(self, status):
         response = self.client.get('/health', follow=True)
-        self.assertEquals(
-            response.data,
-            {
-                'overall_status': status,
-                'detailed_status': {
-                    'database_connection': status
-                }
-            }
-        )
+        self.assertEquals(response.data['overall_status'], status)
+        self.assertEquals(response.data['detailed_status']['database_connection'], status)
         self.assertEquals(response.status_code, 200)
 
+    @override_settings(ANALYTICS_DATABASE_REPLICAS={'default': 1})
+    def test_health_detailed_status(self):
+        detailed_status = self.client.get('/health/').data['detailed_status']
+        self.assertEquals(detailed_status['cache'], 'OK')
+        self.assertEquals(detailed_status['replicas']['default']['status'], 'OK')
+        self.assertGreaterEqual(detailed_status['database_latency'], 0)
+        self.assertGreaterEqual(detailed_status['cache_latency'], 0)
+        self.assertGreaterEqual(detailed_status['replicas']['default']['latency'], 0)
+        self.assertLess(detailed_status['age'], 1)
+
+        with mock.patch('analyticsdataserver.health.cache.get', return_value=None):
+            response = self.client.get('/health/')
+
+        # The cache is not required to serve requests.
+        self.assertEquals(response.data['overall_status'], 'OK')
+        self.assertEquals(response.data['detailed_status']['cache'], 'UNAVAILABLE')
+
+    @override_settings(HEALTH_PROBE_INTERVAL=5)
+    def test_health_probed_in_background(self):
+        with mock.patch('analyticsdataserver.health.start_probe') as start_probe:
+            health.probe()
+
+            # Health checks return the results of the last probe, without querying the database.
+            with self.assertNumQueries(0):
+                response = self.client.get('/health/')
+            self.assertEquals(response.data['overall_status'], 'OK')
+            self.assertTrue(start_probe.called)
+
+            # The system is unavailable if probing is stuck.
+            with mock.patch('analyticsdataserver.health.time.time', return_value=time.time() + 60):
+                response = self.client.get('/health/')
+            self.assertEquals(response.data['overall_status'], 'UNAVAILABLE')
+            self.assertEquals(response.data['detailed_status']['database_connection'], 'OK')
+            self.assertGreaterEqual(response.data['detailed_status']['age'], 60)
+
+    def test_start_probe(self):
+        """ Each process should start a single thread probing the dependencies. """
+        self.addCleanup(setattr, health, '_probe_pid', None)
+
+        with mock.patch('analyticsdataserver.health.threading.Thread') as thread:
+            health.start_probe()
+            health.start_probe()
+            self.assertEquals(thread.return_value.start.call_count, 1)
+
+            with mock.patch('analyticsdataserver.health.os.getpid', return_value=-1):
+                health.start_probe()
+            self.assertEquals(thread.return_value.start.call_count, 2)
+
+    def test_health_public_fields(self):
+        response = self.client.get('/health', follow=True)
+        self.assertEquals(set(response.data), {'overall_status', 'detailed_status'})
+
     @staticmethod
     @contextmanager
     def override_database_connections(databases):
-        with mock.patch('analyticsdataserver.views.connections', ConnectionHandler(databases)):
+        with mock.patch('analyticsdataserver.health.connections', ConnectionHandler(databases)):
             yield
 
     @override_settings(ANALYTICS_DATABASE='reporting')
@@ -87,6 +144,202 @@ class OperationalEndpointsTest(TestCaseWithAuthentication):
             self.assert_database_health('OK')
 
 
+class ConnectionPoolTests(TestCase):
+    def get_default_pool_stats(self):
+        return db.get_pool_stats()['default']
+
+    def test_reused(self):
+        reused = self.get_default_pool_stats()['reused']
+        self.client.get('/status/')
+        self.assertEquals(self.get_default_pool_stats()['reused'], reused + 1)
+
+    def test_max_age(self):
+        self.assertEquals(self.get_default_pool_stats()['max_age'],
+                          connections['default'].settings_dict['CONN_MAX_AGE'])
+
+    def test_unusable_connection(self):
+        """ Reused connections that no longer work should be closed, so that the request connects again. """
+        connection = connections['default']
+        discarded = self.get_default_pool_stats()['discarded']
+
+        with mock.patch.object(connection, 'is_usable', return_value=False) as is_usable:
+            with mock.patch.object(connection, 'close') as close:
+                # Recently used connections are not checked.
+                db.record_connection_use(sender=None)
+                db.check_reused_connections(sender=None)
+                self.assertFalse(is_usable.called)
+                self.assertFalse(close.called)
+
+                with override_settings(DATABASE_HEALTH_CHECK_INTERVAL=0):
+                    db.check_reused_connections(sender=None)
+                close.assert_called_once_with()
+
+        self.assertEquals(self.get_default_pool_stats()['discarded'], discarded + 1)
+
+
+class MetricsTests(TestCaseWithAuthentication):
+    def setUp(self):
+        super(MetricsTests, self).setUp()
+        # pylint: disable=protected-access
+        patcher = mock.patch.object(metrics, '_metrics',
+                                    dict((metric.name, metric) for metric in metrics.get_metrics()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_samples(self):
+        """ Returns the samples of the metrics endpoint, by name and labels. """
+        response = self.authenticated_get('/metrics/', HTTP_ACCEPT='text/plain; version=0.0.4')
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response['Content-Type'], metrics.CONTENT_TYPE)
+
+        samples = {}
+        for line in response.content.splitlines():
+            if not line.startswith('#'):
+                sample, value = line.rsplit(' ', 1)
+                samples[sample] = float(value)
+        return samples
+
+    def test_metrics(self):
+        G(CourseEnrollmentDaily, course_id=u'edX/DemoX/Demo_Course', count=10)
+        path = u'/api/v0/courses/edX/DemoX/Demo_Course/enrollment/'
+        view = u'view="api:v0:courses:enrollment_latest"'
+
+        json_response = self.authenticated_get(path)
+        self.authenticated_get(path)
+
+        samples = self.get_samples()
+        self.assertGreaterEqual(samples[u'analytics_api_request_sql_queries_sum{%s}' % view], 2)
+        self.assertGreater(samples[u'analytics_api_request_sql_duration_seconds_sum{%s}' % view], 0)
+        self.assertEquals(samples[u'analytics_api_response_size_bytes_sum{%s}' % view], 2 * len(json_response.content))
+
+        # Streamed responses are recorded once they have been streamed.
+        csv_response = self.authenticated_get(path, HTTP_ACCEPT='text/csv')
+        self.assertEquals(self.get_samples()[u'analytics_api_request_duration_seconds_count{%s}' % view], 2)
+        content = ''.join(csv_response.streaming_content)
+        self.authenticated_get(u'/api/v0/courses/edX/DemoX/Other_Course/enrollment/')
+
+        samples = self.get_samples()
+        self.assertEquals(samples[u'analytics_api_request_duration_seconds_count{%s}' % view], 4)
+        self.assertEquals(samples[u'analytics_api_request_duration_seconds_bucket{%s,le="+Inf"}' % view], 4)
+        self.assertEquals(samples[u'analytics_api_responses_total{%s,status="200"}' % view], 3)
+        self.assertEquals(samples[u'analytics_api_responses_total{%s,status="404"}' % view], 1)
+        self.assertGreaterEqual(samples[u'analytics_api_response_size_bytes_sum{%s}' % view],
+                                2 * len(json_response.content) + len(content))
+
+    def test_authentication(self):
+        self.assertEquals(self.client.get('/metrics/').status_code, 401)
+
+    def test_database_pools(self):
+        samples = self.get_samples()
+        stats = db.get_pool_stats()['default']
+        database = u'database="default"'
+
+        self.assertGreaterEqual(samples[u'analytics_api_database_connections_open{%s}' % database], 1)
+        self.assertEquals(samples[u'analytics_api_database_connections_opened_total{%s}' % database], stats['opened'])
+        self.assertEquals(samples[u'analytics_api_database_connections_discarded_total{%s}' % database],
+                          stats['discarded'])
+
+    def test_time_queries(self):
+        metrics.reset_queries()
+
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.executemany('SELECT %s', [])
+
+        queries, query_duration = metrics.get_queries()
+        self.assertEquals(queries, 2)
+        self.assertGreaterEqual(query_duration, 0)
+
+    def test_unresolved(self):
+        self.client.get('/does-not-exist/')
+        self.assertEquals(self.get_samples()[u'analytics_api_responses_total{view="unresolved",status="404"}'], 1)
+
+    def test_histogram(self):
+        histogram = metrics.Histogram('duration', 'Duration.', ('view',), (1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe((u'a"b',), value)
+
+        self.assertEquals(metrics.render([histogram]), u'\n'.join([
+            u'# HELP duration Duration.',
+            u'# TYPE duration histogram',
+            u'duration_bucket{view="a\\"b",le="1"} 2.0',
+            u'duration_bucket{view="a\\"b",le="5"} 3.0',
+            u'duration_bucket{view="a\\"b",le="+Inf"} 4.0',
+            u'duration_sum{view="a\\"b"} 14.5',
+            u'duration_count{view="a\\"b"} 4.0',
+        ]) + u'\n')
+
+    def test_metrics_dir(self):
+        """ The metrics of every running process writing to METRICS_DIR should be added up. """
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+
+        # The files of another running process, and of one that exited.
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        other_files = ['metrics-{0}.json'.format(os.getppid()), 'metrics-{0}.json'.format(exited.pid)]
+
+        with override_settings(METRICS_DIR=metrics_dir):
+            for filename in other_files:
+                metrics.record_request('view', 200, 0.1, 2, 0.01, 100)
+                os.rename(os.path.join(metrics_dir, 'metrics-{0}.json'.format(os.getpid())),
+                          os.path.join(metrics_dir, filename))
+
+            metrics.record_request('view', 500, 0.1, 2, 0.01, 100)
+            samples = self.get_samples()
+
+        self.assertEquals(samples[u'analytics_api_responses_total{view="view",status="200"}'], 3)
+        self.assertEquals(samples[u'analytics_api_responses_total{view="view",status="500"}'], 1)
+        self.assertEquals(samples[u'analytics_api_response_size_bytes_count{view="view"}'], 4)
+        self.assertEquals(sorted(os.listdir(metrics_dir)),
+                          sorted([other_files[0], 'metrics-{0}.json'.format(os.getpid())]))
+
+    def test_flush_snapshot(self):
+        """ Metrics should be written without blocking the requests recording theirs. """
+        metrics.record_request('view', 200, 0.1, 2, 0.01, 100)
+        locked = []
+
+        def dump(content, metrics_file):
+            # pylint: disable=protected-access
+            locked.append(metrics._lock.locked())
+            # Recording metrics while the file is written does not change the values being written.
+            with override_settings(METRICS_DIR=None):
+                metrics.record_request('view', 200, 0.1, 2, 0.01, 100)
+            metrics_file.write(json.dumps(content))
+
+        with override_settings(METRICS_DIR=tempfile.mkdtemp()):
+            self.addCleanup(shutil.rmtree, settings.METRICS_DIR)
+
+            with mock.patch('analyticsdataserver.metrics.json.dump', side_effect=dump):
+                metrics.flush()
+
+            with open(os.path.join(settings.METRICS_DIR, 'metrics-{0}.json'.format(os.getpid()))) as metrics_file:
+                content = json.load(metrics_file)
+
+        self.assertEquals(locked, [False])
+        self.assertEquals(content['analytics_api_request_duration_seconds'][0][1][-2:], [0, 0.1])
+        self.assertEquals(content['analytics_api_responses_total'], [[['view', '200'], 1]])
+
+    @override_settings(METRICS_FLUSH_INTERVAL=5)
+    def test_flush_in_background(self):
+        """ Metrics should be written to METRICS_DIR by a thread of each process, rather than by requests. """
+        self.addCleanup(setattr, metrics, '_flusher_pid', None)
+
+        with override_settings(METRICS_DIR=tempfile.mkdtemp()):
+            self.addCleanup(shutil.rmtree, settings.METRICS_DIR)
+
+            with mock.patch('analyticsdataserver.metrics.Thread') as thread:
+                metrics.record_request('view', 200, 0.1, 2, 0.01, 100)
+                metrics.record_request('view', 200, 0.1, 2, 0.01, 100)
+
+            self.assertEquals(thread.return_value.start.call_count, 1)
+            self.assertEquals(os.listdir(settings.METRICS_DIR), [])
+
+            # Metrics are also written when the process exits.
+            metrics._flush_at_exit()  # pylint: disable=protected-access
+            self.assertEquals(os.listdir(settings.METRICS_DIR), ['metrics-{0}.json'.format(os.getpid())])
+
+
 class AnalyticsApiRouterTests(TestCase):
     def setUp(self):
         self.router = AnalyticsApiRouter()
@@ -97,3 +350,160 @@ class AnalyticsApiRouterTests(TestCase):
         """
         self.assertFalse(self.router.allow_relation(CourseEnrollmentDaily, User))
         self.assertTrue(self.router.allow_relation(CourseEnrollmentDaily, CourseEnrollmentByBirthYear))
+
+    def test_allow_migrate(self):
+        with override_settings(ANALYTICS_DATABASE_REPLICAS={'replica': 1}):
+            self.assertFalse(self.router.allow_migrate('replica', CourseEnrollmentDaily))
+            self.assertFalse(self.router.allow_migrate('replica', User))
+            self.assertTrue(self.router.allow_migrate('default', CourseEnrollmentDaily))
+
+    @override_settings(ANALYTICS_DATABASE_SHARDS={
+        'CLASS': 'analytics_data_api.v0.sharding.ExplicitShardMap',
+        'OPTIONS': {'orgs': {'edX': 'shard'}},
+    }, ANALYTICS_DATABASE_REPLICAS={'replica': 1})
+    def test_sharding(self):
+        course_id = u'edX/DemoX/Demo_Course'
+        self.assertEqual(self.router.db_for_read(CourseEnrollmentDaily, course_id=course_id), 'shard')
+        # pylint: disable=no-value-for-parameter,unexpected-keyword-arg
+        instance = CourseEnrollmentDaily(course_id=course_id)
+        self.assertEqual(self.router.db_for_write(CourseEnrollmentDaily, instance=instance), 'shard')
+        self.assertEqual(CourseEnrollmentDaily.objects.db_manager(hints={'course_id': course_id}).all().db, 'shard')
+        self.assertEqual(self.router.db_for_write(CourseEnrollmentDaily, course_id=u'MITx/6.002x/2014'), 'default')
+        self.assertIsNone(self.router.db_for_read(User, course_id=course_id))
+
+        self.assertTrue(self.router.allow_migrate('shard', CourseEnrollmentDaily))
+        self.assertTrue(self.router.allow_migrate('default', CourseEnrollmentDaily))
+        self.assertFalse(self.router.allow_migrate('shard', User))
+
+
+@override_settings(ANALYTICS_DATABASE='primary', ANALYTICS_DATABASE_REPLICAS={'replica_1': 1, 'replica_2': 3})
+class AnalyticsApiRouterReplicaTests(TestCase):
+    def setUp(self):
+        self.router = AnalyticsApiRouter()
+        self.lags = {'replica_1': 0, 'replica_2': 0}
+        patcher = mock.patch('analyticsdataserver.router.get_replication_lag', side_effect=self.lags.get)
+        self.get_replication_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(router._health.clear)  # pylint: disable=protected-access
+        self.addCleanup(router.record_replica_request, sender=None)
+
+    def check(self):
+        """ Checks the replicas, as the health probe does. """
+        for alias in settings.ANALYTICS_DATABASE_REPLICAS:
+            router.check_replica(alias)
+
+    def read(self, point=0):
+        """ Returns the database read from by a new request, given the random point at which replicas are chosen. """
+        router.reset_read_database(sender=None)
+
+        with mock.patch('analyticsdataserver.router.random.uniform', return_value=point):
+            database = self.router.db_for_read(CourseEnrollmentDaily)
+
+        router.record_replica_request(sender=None)
+        return database
+
+    @override_settings(ANALYTICS_DATABASE_REPLICAS={})
+    def test_without_replicas(self):
+        self.assertEqual(self.read(), 'primary')
+
+    def test_weights(self):
+        self.assertEqual(self.read(1), 'replica_1')
+        self.assertEqual(self.read(1.5), 'replica_2')
+        self.assertEqual(self.read(4), 'replica_2')
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(self.router.db_for_write(CourseEnrollmentDaily), 'primary')
+
+    def test_read_database_per_request(self):
+        """ Every read of a request should be sent to the same database. """
+        router.reset_read_database(sender=None)
+
+        with mock.patch('analyticsdataserver.router.random.uniform', return_value=0):
+            self.assertEqual(self.router.db_for_read(CourseEnrollmentDaily), 'replica_1')
+
+        with mock.patch('analyticsdataserver.router.random.uniform', return_value=4):
+            self.assertEqual(self.router.db_for_read(CourseEnrollmentByBirthYear), 'replica_1')
+            router.record_replica_request(sender=None)
+            self.assertEqual(self.router.db_for_read(CourseEnrollmentDaily), 'replica_2')
+
+    def test_read_database_outside_requests(self):
+        """ Reads outside of requests should move off their replica once it is ejected. """
+        with mock.patch('analyticsdataserver.router.random.uniform', return_value=0):
+            self.assertEqual(self.router.db_for_read(CourseEnrollmentDaily), 'replica_1')
+
+        with mock.patch('analyticsdataserver.router.random.uniform', return_value=4):
+            self.assertEqual(self.router.db_for_read(CourseEnrollmentDaily), 'replica_1')
+
+            self.lags['replica_1'] = 120
+            self.check()
+            self.assertEqual(self.router.db_for_read(CourseEnrollmentDaily), 'replica_2')
+
+    def test_reads_do_not_check_replicas(self):
+        """ Replicas are checked by the health probe, never while choosing the database to read from. """
+        self.read()
+        self.assertFalse(self.get_replication_lag.called)
+
+        with mock.patch('analyticsdataserver.health.check_database'):
+            health.probe()
+        self.assertEqual(self.get_replication_lag.call_count, 2)
+
+    def test_lagging_replica(self):
+        self.lags['replica_1'] = 120
+        self.check()
+        self.assertEqual(self.read(0), 'replica_2')
+
+        # Ejected replicas are not checked again until they have been ejected for ANALYTICS_REPLICA_EJECT_TIME.
+        self.lags['replica_1'] = 0
+        self.check()
+        self.assertEqual(self.read(0), 'replica_2')
+
+        with mock.patch('analyticsdataserver.router.time.time', return_value=time.time() + 120):
+            self.check()
+            self.assertEqual(self.read(0), 'replica_1')
+
+    def test_unavailable_replicas(self):
+        """ Reads should be sent to the primary if no replica is available. """
+        self.lags['replica_1'] = None
+        self.get_replication_lag.side_effect = DatabaseError
+        self.check()
+        self.assertEqual(self.read(), 'primary')
+
+    def test_lag_denied(self):
+        """ Replicas whose lag cannot be measured should be ejected, and the missing privilege reported once. """
+        self.get_replication_lag.side_effect = DatabaseError(router.ER_SPECIFIC_ACCESS_DENIED_ERROR, 'Access denied')
+
+        with mock.patch('analyticsdataserver.router.logger') as logger:
+            self.check()
+            self.assertEqual(self.read(), 'primary')
+
+            with mock.patch('analyticsdataserver.router.time.time', return_value=time.time() + 120):
+                self.check()
+
+        self.assertEqual(logger.error.call_count, 2)
+        self.assertEqual(sorted(call[0][1] for call in logger.error.call_args_list), ['replica_1', 'replica_2'])
+        self.assertFalse(logger.exception.called)
+
+    @override_settings(ANALYTICS_REPLICA_CHECK_LAG=False)
+    def test_lag_not_checked(self):
+        self.lags['replica_1'] = None
+        self.check()
+        self.assertEqual(self.read(0), 'replica_1')
+        self.assertFalse(self.get_replication_lag.called)
+
+    def test_error_rate(self):
+        # Errors are counted between checks.
+        for request in range(router.MIN_REQUESTS_FOR_ERROR_RATE):
+            router.reset_read_database(sender=None)
+
+            with mock.patch('analyticsdataserver.router.random.uniform', return_value=4):
+                self.assertEqual(self.router.db_for_read(CourseEnrollmentDaily), 'replica_2')
+
+            if request % 3 == 0:
+                try:
+                    raise DatabaseError  # pylint: disable=nonstandard-exception
+                except DatabaseError:  # pylint: disable=catching-non-exception
+                    router.record_replica_error(sender=None)
+
+            router.record_replica_request(sender=None)
+
+        self.check()
+        self.assertEqual(self.read(4), 'replica_1')
@@ -18,6 +18,7 @@ urlpatterns = patterns(
     url(r'^status/$', views.StatusView.as_view(), name='status'),
     url(r'^authenticated/$', views.AuthenticationTestView.as_view(), name='authenticated'),
     url(r'^health/$', views.HealthView.as_view(), name='health'),
+    url(r'^metrics/$', views.MetricsView.as_view(), name='metrics'),
 )
 
 if settings.ENABLE_ADMIN_SITE:  # pragma: no cover
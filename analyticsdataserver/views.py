@@ -2,10 +2,11 @@ from django.http import HttpResponse
 from rest_framework.renderers import JSONRenderer
 from rest_framework import permissions
 from rest_framework.response import Response
-from django.conf import settings
-from django.db import connections
 from rest_framework.views import APIView
 
+from analyticsdataserver import metrics
+from analyticsdataserver.health import get_health
+
 
 def handle_internal_server_error(_request):
     """Notify the client that an error occurred processing the request without providing any detail."""
@@ -57,39 +58,53 @@ class HealthView(APIView):
     """
    A more comprehensive check to see if the system is fully operational.
 
-   This endpoint is public and does not require an authentication token to access it.
+   This endpoint is public and does not require an authentication token to access it. The dependencies are probed in
+   the background every HEALTH_PROBE_INTERVAL seconds, and the results of the last probe are returned.
 
    The returned structure contains the following fields:
 
-   - overall_status: Can be either "OK" or "UNAVAILABLE".
+   - overall_status: Can be either "OK" or "UNAVAILABLE". The status is "UNAVAILABLE" if the database is unavailable,
+     or if the last probe is older than HEALTH_PROBE_MAX_AGE seconds.
    - detailed_status: More detailed information about the status of the system.
        - database_connection: Status of the database connection. Can be either "OK" or "UNAVAILABLE".
+       - database_latency: The number of milliseconds it took to query the database.
+       - replicas: The status and latency of each read replica of the database.
+       - cache: Status of the cache. Can be either "OK" or "UNAVAILABLE".
+       - cache_latency: The number of milliseconds it took to store and retrieve a value in the cache.
+       - probed_at: The time at which the dependencies were probed.
+       - age: The number of seconds since the dependencies were probed.
+
+   The state of the database connection pools is only exposed by the authenticated metrics endpoint.
 
    """
     permission_classes = (permissions.AllowAny,)
 
     def get(self, request, *args, **kwargs):  # pylint: disable=unused-argument
-        overall_status = 'UNAVAILABLE'
-        db_conn_status = 'UNAVAILABLE'
-
-        try:
-            connection_name = getattr(settings, 'ANALYTICS_DATABASE', 'default')
-            cursor = connections[connection_name].cursor()
-            try:
-                cursor.execute("SELECT 1")
-                cursor.fetchone()
-                overall_status = 'OK'
-                db_conn_status = 'OK'
-            finally:
-                cursor.close()
-        except Exception:  # pylint: disable=broad-except
-            pass
+        overall_status, detailed_status = get_health()
 
         response = {
             "overall_status": overall_status,
-            "detailed_status": {
-                'database_connection': db_conn_status
-            }
+            "detailed_status": detailed_status,
         }
 
         return Response(response)
+
+
+class MetricsView(APIView):
+    """
+    Metrics of the requests served by each view, in the Prometheus text exposition format
+
+    The metrics include the latency of requests, the number of SQL queries they run and the time taken to run them,
+    the size of responses, the number of responses with each status code, and the state of the database connection
+    pools. This endpoint requires an authentication
+    token, which scrapers send in the Authorization header (e.g. "Authorization: Token <token>").
+
+    """
+
+    def perform_content_negotiation(self, request, force=False):
+        # The metrics are rendered in the Prometheus format whatever the client accepts. Renderers are only used for
+        # errors (e.g. if the client is not authenticated).
+        return super(MetricsView, self).perform_content_negotiation(request, force=True)
+
+    def get(self, request, *args, **kwargs):  # pylint: disable=unused-argument
+        return HttpResponse(metrics.render(metrics.collect()), content_type=metrics.CONTENT_TYPE)
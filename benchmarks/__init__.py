@@ -0,0 +1,12 @@
+"""
+Benchmarks of the API's hot paths, run as modules (e.g. python -m benchmarks.country_lookup).
+
+Django is set up with the test settings when the package is imported, so that the benchmarks can import models and
+views at the top of their modules.
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'analyticsdataserver.settings.test')
+django.setup()
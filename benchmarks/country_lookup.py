@@ -0,0 +1,52 @@
+"""
+Compares the per-row cost of resolving countries for the enrollment by location endpoint.
+
+CourseEnrollmentByLocationView resolves the country of each row several times while grouping and serializing. This
+benchmark runs those lookups over a realistic set of rows with the original django_countries-based lookup and the
+precomputed country table.
+
+Run with: python -m benchmarks.country_lookup
+"""
+from functools import partial
+import timeit
+
+from django_countries import countries
+
+from analytics_data_api.constants import country
+
+# Roughly 200 countries per day, plus codes the pipeline emits for locations that could not be determined.
+CODES = sorted(countries.countries) + [u'', u'A1', u'A2', u'AP', u'EU', u'O1', u'UNKNOWN']
+DAYS = 30
+LOOKUPS_PER_ROW = 3
+
+
+def legacy_get_country(code):
+    """ The original lookup, which queried django_countries four times per call. """
+    if not code:
+        return country.UNKNOWN_COUNTRY
+
+    name = unicode(countries.name(code))
+    if not name:
+        return country.UNKNOWN_COUNTRY
+
+    return country.Country(name, *[unicode(getattr(countries, prop)(code)) for prop in ('alpha2', 'alpha3', 'numeric')])
+
+
+def resolve_rows(get_country):
+    for _day in xrange(DAYS):
+        for code in CODES:
+            for _lookup in xrange(LOOKUPS_PER_ROW):
+                get_country(code)
+
+
+def main():
+    rows = DAYS * len(CODES)
+    print 'Resolving countries for {0} rows ({1} lookups per row)'.format(rows, LOOKUPS_PER_ROW)
+
+    for name, get_country in (('django_countries', legacy_get_country), ('country table', country.get_country)):
+        elapsed = min(timeit.repeat(partial(resolve_rows, get_country), number=1, repeat=5))
+        print '{0:>18}: {1:8.2f} ms total, {2:6.2f} us per row'.format(name, elapsed * 1000, elapsed * 1e6 / rows)
+
+
+if __name__ == '__main__':
+    main()
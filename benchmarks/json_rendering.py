@@ -0,0 +1,93 @@
+"""
+Compares the cost of rendering JSON responses with each of the supported JSON renderer backends.
+
+The payloads are serialized by the serializers used by the views: a year of daily enrollment, by mode, for a batch of
+courses, and the answer distribution of a course's problems. Backends that are not installed are skipped.
+
+Run with: python -m benchmarks.json_rendering
+"""
+import datetime
+import timeit
+
+from django.test.utils import override_settings
+from django.utils.timezone import utc
+
+from analytics_data_api import renderers
+from analytics_data_api.v0 import models, serializers
+from analytics_data_api.v0.serializers import ENROLLMENT_MODES
+
+COURSES = 20
+DAYS = 365
+PROBLEMS = 200
+ANSWERS_PER_PROBLEM = 50
+CREATED = datetime.datetime(2014, 10, 1, 4, 30, 12, tzinfo=utc)
+
+# Indented responses are requested by the browsable API, and by clients that want readable output.
+INDENTED = 'application/json; indent=4'
+
+
+def enrollment_payload():
+    rows = []
+    start = datetime.date(2014, 1, 1)
+
+    for course in xrange(COURSES):
+        for day in xrange(DAYS):
+            row = {
+                'course_id': u'edX/DemoX{0}/Demo_Course'.format(course),
+                'date': start + datetime.timedelta(days=day),
+                'count': 10000 + day,
+                'created': CREATED,
+            }
+            for index, mode in enumerate(ENROLLMENT_MODES):
+                row[mode] = 1000 * (index + 1) + day
+            rows.append(row)
+
+    return serializers.CourseEnrollmentModeDailySerializer(rows, many=True).data  # pylint: disable=no-member
+
+
+def answer_distribution_payload():
+    # pylint: disable=unexpected-keyword-arg,no-value-for-parameter
+    rows = []
+
+    for problem in xrange(PROBLEMS):
+        module_id = u'i4x://edX/DemoX/problem/{0:032x}'.format(problem)
+
+        for answer in xrange(ANSWERS_PER_PROBLEM):
+            rows.append(models.ProblemResponseAnswerDistribution(
+                course_id=u'edX/DemoX/Demo_Course', module_id=module_id, part_id=u'{0}_2_1'.format(module_id),
+                correct=answer == 0, count=answer * 7, value_id=u'choice_{0}'.format(answer),
+                answer_value_text=u'R\xe9ponse num\xe9ro {0}'.format(answer), answer_value_numeric=answer / 3.0,
+                variant=None, problem_display_name=u'Probl\xe8me {0}'.format(problem),
+                question_text=u'Which of the following is <b>correct</b>?', created=CREATED))
+
+    return serializers.ProblemResponseAnswerDistributionSerializer(rows, many=True).data  # pylint: disable=no-member
+
+
+def main():
+    renderer = renderers.JSONRenderer()
+    # pylint: disable=protected-access
+    backends = [name for name in sorted(renderers.JSON_BACKENDS) if renderers._get_json_module(name) is not None]
+
+    payloads = (('enrollment', enrollment_payload()), ('answer distribution', answer_distribution_payload()))
+
+    for payload_name, payload in payloads:
+        print 'Rendering {0} rows of {1}'.format(len(payload), payload_name)
+
+        for media_type in (None, INDENTED):
+            rendered = set()
+
+            for name in backends:
+                with override_settings(JSON_RENDERER_BACKENDS=(name,)):
+                    render = lambda: renderer.render(payload, media_type)  # pylint: disable=cell-var-from-loop
+                    elapsed = min(timeit.repeat(render, number=1, repeat=20))
+                    rendered.add(render())
+
+                print '{0:>12}{1:>10}: {2:8.2f} ms total, {3:6.2f} us per row'.format(
+                    name, ' indented' if media_type else '', elapsed * 1000, elapsed * 1e6 / len(payload))
+
+            if len(rendered) > 1:
+                print 'WARNING: the backends rendered different output.'
+
+
+if __name__ == '__main__':
+    main()